@@ -102,6 +102,9 @@ class NIFTI_MRS(Image):
         elif isinstance(args[0], str):
             args = list(args)
             filename = Path(args[0]).name
+        else:
+            # nibabel image, data used as stored
+            filename = None
 
         super().__init__(*args, **kwargs)
 
@@ -202,11 +205,12 @@ class NIFTI_MRS(Image):
         """Read dim tags from current header extension"""
         dim_tags = [None, None, None]
         std_tags = ['DIM_COIL', 'DIM_DYN', 'DIM_INDIRECT_0']
+        hdr_ext = self.hdr_ext
         for idx in range(3):
             curr_dim = idx + 5
             curr_tag = f'dim_{curr_dim}'
-            if curr_tag in self.hdr_ext:
-                dim_tags[idx] = self.hdr_ext[curr_tag]
+            if curr_tag in hdr_ext:
+                dim_tags[idx] = hdr_ext[curr_tag]
             elif curr_dim < self.ndim:
                 dim_tags[idx] = std_tags[idx]
         return dim_tags
@@ -321,14 +325,17 @@ class NIFTI_MRS(Image):
         current_hdr_ext[f'dim_{dim + 1}_header'] = hdr_obj
         self.hdr_ext = current_hdr_ext
 
-    def copy(self, remove_dim=None):
+    def copy(self, remove_dim=None, empty=False):
         '''Return a copy of this image, optionally with a dimension removed.
         Args:
-            dim - None, dimension index (4, 5, 6) or tag. None iterates over all indices.'''
+            dim - None, dimension index (4, 5, 6) or tag. None iterates over all indices.
+            empty - If True the data are left uninitialised rather than copied.'''
         if remove_dim:
             dim = self._dim_tag_to_index(remove_dim)
-            reduced_data = self.data.take(0, axis=dim)
-            new_obj = NIFTI_MRS(reduced_data, header=self.header)
+            if empty:
+                new_obj = self._empty(self.shape[:dim] + self.shape[dim + 1:])
+            else:
+                new_obj = NIFTI_MRS(self.data.take(0, axis=dim), header=self.header)
             new_obj._filename = self.filename
 
             # Modify the dim information in
@@ -349,9 +356,22 @@ class NIFTI_MRS(Image):
             new_obj.hdr_ext = hdr_ext
 
             return new_obj
+        elif empty:
+            return self._empty(self.shape)
         else:
             return NIFTI_MRS(self.data, header=self.header)
 
+    def _empty(self, shape):
+        '''Return a NIFTI_MRS of shape with this header and uninitialised data.
+        The buffer is wrapped in a nibabel image directly, avoiding the
+        conjugated copy made for array input.'''
+        header = self.header.copy()
+        header.set_data_dtype(self.dtype)
+        nib_image = type(self.nibImage)(np.empty(shape, dtype=self.dtype),
+                                        header.get_best_affine(),
+                                        header=header)
+        return NIFTI_MRS(nib_image)
+
     def iterate_over_dims(self, dim=None, iterate_over_space=False, reduce_dim_index=False, voxel_index=None):
         '''Return generator to iterate over all indices or one dimension (and FID).
         Args:
@@ -23,54 +23,71 @@ svs_water = testsPath / 'testdata/fsl_mrs/wref.nii.gz'
 svs_basis = testsPath / 'testdata/fsl_mrs/steam_basis'
 
 
-@pytest.fixture
-def synth_data():
+@pytest.fixture(scope='session')
+def _synth_session_data():
+    # Generated once per session, arrays are made read-only
+    # to catch any test modifying them.
 
     fid, hdr = syn.syntheticFID()
     hdr['json'] = {'ResonantNucleus': '1H'}
 
-    basis_1, bhdr_1 = syn.syntheticFID(noisecovariance=[[0.0]],
-                                       chemicalshift=[-2, ],
-                                       amplitude=[0.1, ],
-                                       damping=[5, ])
-
-    basis_2, bhdr_2 = syn.syntheticFID(noisecovariance=[[0.0]],
-                                       chemicalshift=[3, ],
+    # syntheticFID sums all peaks into one FID, so each single peak
+    # basis spectrum needs its own call.
+    basis = []
+    bheader = []
+    for cs in (-2, 3):
+        b_fid, bhdr = syn.syntheticFID(noisecovariance=[[0.0]],
+                                       chemicalshift=[cs, ],
                                        amplitude=[0.1, ],
                                        damping=[5, ])
-
-    bhdr_1['fwhm'] = 1.0
-    bhdr_2['fwhm'] = 1.0
-    basis = np.concatenate((basis_1, basis_2)).T
-    bheader = [bhdr_1, bhdr_2]
+        bhdr['fwhm'] = 1.0
+        basis.append(b_fid[0])
+        bheader.append(bhdr)
+    basis = np.stack(basis, axis=1)
     names = ['ppm_2', 'ppm3']
 
+    points = fid[0].size
+    cf = hdr['centralFrequency'] * 1E6
     timeAxis = np.linspace(hdr['dwelltime'],
-                           hdr['dwelltime'] * 2048,
-                           2048)
+                           hdr['dwelltime'] * points,
+                           points)
     frequencyAxis = np.linspace(-hdr['bandwidth'] / 2,
                                 hdr['bandwidth'] / 2,
-                                2048)
-    ppmAxis = hz2ppm(hdr['centralFrequency'] * 1E6,
-                     frequencyAxis,
-                     shift=False)
-    ppmAxisShift = hz2ppm(hdr['centralFrequency'] * 1E6,
-                          frequencyAxis,
-                          shift=True)
+                                points)
+    ppmAxis = hz2ppm(cf, frequencyAxis, shift=False)
+    ppmAxisShift = hz2ppm(cf, frequencyAxis, shift=True)
 
     axes = {'time': timeAxis,
             'freq': frequencyAxis,
             'ppm': ppmAxis,
             'ppm_shift': ppmAxisShift}
 
-    return fid[0], hdr, basis, names, bheader, axes
+    fid = fid[0]
+    for arr in [fid, basis] + list(axes.values()):
+        arr.setflags(write=False)
+
+    return fid, hdr, basis, names, bheader, axes
+
+
+@pytest.fixture
+def synth_data(_synth_session_data):
+    # FIDToSpec scales the first point in place and MRS/Basis take
+    # ownership of the name and header lists, so hand out fresh copies.
+    fid, hdr, basis, names, bheader, axes = _synth_session_data
+    return fid.copy(), hdr.copy(), basis, list(names), [h.copy() for h in bheader], axes
+
+
+@pytest.fixture(scope='session')
+def svs_mrs():
+    # Loaded once per session, copy before modifying in a test.
+    return mrs_from_files(str(svs_metab),
+                          str(svs_basis),
+                          H2O_file=str(svs_water))
 
 
-def test_load_from_file():
+def test_load_from_file(svs_mrs):
 
-    mrs = mrs_from_files(str(svs_metab),
-                         str(svs_basis),
-                         H2O_file=str(svs_water))
+    mrs = svs_mrs
 
     assert mrs.FID.shape == (4095,)
     assert mrs.basis.shape == (4095, 20)
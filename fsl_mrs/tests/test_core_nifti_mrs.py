@@ -153,6 +153,43 @@ def test_gen_new_nifti_mrs(tmp_path):
     assert (tmp_path / 'out.nii.gz').exists()
 
 
+def test_copy(monkeypatch):
+    nmrs = gen_new_nifti_mrs(np.ones((1, 1, 1, 16, 4, 2), dtype=complex),
+                             0.0005, 120.0,
+                             dim_tags=['DIM_DYN', 'DIM_EDIT', None])
+
+    copied = nmrs.copy()
+    assert np.allclose(copied[:], nmrs[:])
+
+    # Empty copies wrap the uninitialised buffer without copying it
+    buffers = []
+    np_empty = np.empty
+
+    def record_empty(*args, **kwargs):
+        buffers.append(np_empty(*args, **kwargs))
+        return buffers[-1]
+
+    monkeypatch.setattr(np, 'empty', record_empty)
+    empty = nmrs.copy(empty=True)
+    reduced_empty = nmrs.copy(remove_dim='DIM_DYN', empty=True)
+    monkeypatch.undo()
+
+    assert empty.shape == nmrs.shape
+    assert empty.dtype == nmrs.dtype
+    assert empty.dwelltime == nmrs.dwelltime
+    assert empty.dim_tags == nmrs.dim_tags
+    assert empty.nibImage.dataobj is buffers[0]
+    assert reduced_empty.nibImage.dataobj is buffers[1]
+
+    empty[:] = nmrs[:]
+    assert np.allclose(empty[:], nmrs[:])
+    assert np.allclose(buffers[0], nmrs[:].conj())
+
+    reduced = nmrs.copy(remove_dim='DIM_DYN')
+    assert reduced_empty.shape == reduced.shape == (1, 1, 1, 16, 2)
+    assert reduced_empty.dim_tags == reduced.dim_tags == ['DIM_EDIT', None, None]
+
+
 def test_add_remove_field():
 
     nmrs = NIFTI_MRS(data['unprocessed'])
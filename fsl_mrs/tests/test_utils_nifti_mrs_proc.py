@@ -6,6 +6,10 @@ Copyright Will Clarke, University of Oxford, 2021
 '''
 from pathlib import Path
 
+import numpy as np
+
+from fsl_mrs.core.nifti_mrs import gen_new_nifti_mrs
+from fsl_mrs.utils.synthetic import syntheticFID
 from fsl_mrs.utils.preproc import nifti_mrs_proc as nproc
 from fsl_mrs.utils.mrs_io import read_FID
 from fsl_mrs.utils.nifti_mrs_tools import split
@@ -245,3 +249,83 @@ def test_conjugate():
     assert conjugated.hdr_ext['ProcessingApplied'][0]['Method'] == 'Conjugation'
     assert conjugated.hdr_ext['ProcessingApplied'][0]['Details']\
         == 'fsl_mrs.utils.preproc.nifti_mrs_proc.conjugate.'
+
+
+def test_inplace():
+    FID, hdr = syntheticFID(noisecovariance=[[1E-3]], points=512)
+    FID = np.asarray(FID).T.reshape((1, 1, 1, 512, 1))
+    FID = np.tile(FID, (2, 1, 1, 1, 3))
+
+    def gen_data():
+        return gen_new_nifti_mrs(FID.copy(),
+                                 hdr['dwelltime'],
+                                 hdr['centralFrequency'],
+                                 dim_tags=['DIM_DYN', None, None])
+
+    calls = [(nproc.apodize, ((10.0,),)),
+             (nproc.fshift, (10.0,)),
+             (nproc.ecc, (gen_data(),)),
+             (nproc.shift_to_reference, (3.0, (2.0, 4.0))),
+             (nproc.tshift, (0.0, 0.001)),
+             (nproc.remove_peaks, ((4.5, 5.0),)),
+             (nproc.hlsvd_model_peaks, ((2.5, 3.5),)),
+             (nproc.align, ('DIM_DYN',)),
+             (nproc.conjugate, ())]
+    for func, args in calls:
+        nmrs_obj = gen_data()
+        expected = func(nmrs_obj, *args)
+        assert np.allclose(nmrs_obj[:], FID)
+
+        processed = func(nmrs_obj, *args, inplace=True)
+        assert processed is nmrs_obj
+        assert np.allclose(processed[:], expected[:])
+        assert processed.dwelltime == expected.dwelltime
+        assert processed.hdr_ext['ProcessingApplied'][-1]['Details']\
+            == expected.hdr_ext['ProcessingApplied'][-1]['Details']
+
+
+def test_working_precision():
+    # Input precision is kept unless USE_FP32 is set, e.g. for difference
+    # spectra of large, nearly equal signals.
+    FID, hdr = syntheticFID(noisecovariance=[[1E-3]], points=512)
+    FID = np.asarray(FID).T.reshape((1, 1, 1, 512, 1))
+    FID = np.tile(FID, (1, 1, 1, 1, 2)) * 1E4
+    FID[..., 1] += 1E-3
+    nmrs_obj = gen_new_nifti_mrs(FID,
+                                 hdr['dwelltime'],
+                                 hdr['centralFrequency'],
+                                 dim_tags=['DIM_EDIT', None, None])
+
+    diff = nproc.subtract(nmrs_obj, dim='DIM_EDIT')
+    assert np.allclose(diff[:], -0.5E-3, rtol=0, atol=1E-9)
+
+    window = np.exp(-np.arange(512) * hdr['dwelltime'] * 10.0)
+    apodized = nproc.apodize(nmrs_obj, (10.0,))
+    assert np.allclose(apodized[:], nmrs_obj[:] * window[:, None], rtol=1E-12, atol=0)
+
+    try:
+        nproc.USE_FP32 = True
+        diff32 = nproc.subtract(nmrs_obj, dim='DIM_EDIT')
+        phased32 = nproc.apply_fixed_phase(nmrs_obj, 30.0)
+        apodized32 = nproc.apodize(nmrs_obj, (10.0,))
+    finally:
+        nproc.USE_FP32 = False
+    assert diff32[:].dtype == nmrs_obj[:].dtype
+    assert not np.allclose(diff32[:], -0.5E-3, rtol=0, atol=1E-9)
+    assert np.allclose(phased32[:], nproc.apply_fixed_phase(nmrs_obj, 30.0)[:], rtol=1E-5)
+    assert np.allclose(apodized32[:], apodized[:], rtol=1E-5)
+
+
+def test_n_jobs():
+    # Process pools are opt-in and give the serial result
+    FID, hdr = syntheticFID(noisecovariance=[[1E-3]], points=512)
+    FID = np.asarray(FID).T.reshape((1, 1, 1, 512, 1))
+    FID = np.tile(FID, (1, 1, 1, 1, 4))
+    nmrs_obj = gen_new_nifti_mrs(FID,
+                                 hdr['dwelltime'],
+                                 hdr['centralFrequency'],
+                                 dim_tags=['DIM_DYN', None, None])
+
+    serial = nproc.remove_peaks(nmrs_obj, (4.5, 5.0))
+    pooled = nproc.remove_peaks(nmrs_obj, (4.5, 5.0), n_jobs=2)
+    assert np.allclose(pooled[:], serial[:])
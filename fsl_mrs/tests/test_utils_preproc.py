@@ -87,6 +87,29 @@ def test_combine_FIDs():
     assert np.allclose(np.abs(combfid[:200]), np.abs(analyticalRoemer[:200]), atol=1E-2, rtol=1E-1)
 
 
+def test_combine_FIDs_batched():
+    # A batch of (time x coil) arrays combines the same as each one alone.
+    batch = []
+    for _ in range(3):
+        fids, _ = syn.syntheticFID(noisecovariance=0.01 * np.eye(4),
+                                   coilamps=0.5 + np.random.rand(4),
+                                   coilphase=np.random.rand(4) * 2 * np.pi,
+                                   points=512)
+        batch.append(np.asarray(fids).T)
+    batch = np.stack(batch)
+
+    combined = preproc.combine_FIDs(batch, 'svd', do_prewhiten=True)
+    _, weights = preproc.combine_FIDs(batch, 'svd_weights', do_prewhiten=True)
+    weighted = preproc.combine_FIDs(batch, 'weighted', weights=weights)
+    mean = preproc.combine_FIDs(batch, 'mean')
+    for idx, fids in enumerate(batch):
+        assert np.allclose(mean[idx], preproc.combine_FIDs(list(fids.T), 'mean'))
+        assert np.allclose(combined[idx], preproc.combine_FIDs(fids, 'svd', do_prewhiten=True))
+        _, single_weights = preproc.combine_FIDs(fids, 'svd_weights', do_prewhiten=True)
+        assert np.allclose(weights[idx], single_weights)
+        assert np.allclose(weighted[idx], preproc.combine_FIDs(fids, 'weighted', weights=single_weights))
+
+
 # Test the alignment by aligning based on two sets of offset peaks with
 # different offsets and measuring combined peak height
 def test_phase_freq_align():
@@ -160,6 +183,38 @@ def test_apodize():
     assert apodFID[0] == 1.0
 
 
+# Test that stacked FIDs (time on last axis) give the same result as single FIDs
+def test_stacked_fids():
+    testFIDs, testHdrs = syn.syntheticFID(coilamps=[1.0, 0.5],
+                                          coilphase=[0.0, 1.0],
+                                          noisecovariance=[[0.01, 0.0], [0.0, 0.01]])
+    stacked = np.stack(testFIDs)
+    dt = testHdrs['dwelltime']
+
+    def check(func, *args, **kwargs):
+        batch = func(stacked, *args, **kwargs)
+        single = [func(fid, *args, **kwargs) for fid in testFIDs]
+        if isinstance(batch, tuple):
+            batch = batch[0]
+            single = [s[0] for s in single]
+        assert np.allclose(batch, np.stack(single))
+
+    check(preproc.apodize, dt, [10])
+    check(preproc.apodize, dt, [10, 0.01], 'l2g')
+    check(preproc.freqshift, dt, 100.0)
+    check(preproc.timeshift, dt, 0.001, 0.0)
+    check(preproc.timeshift, dt, -0.001, 0.001, samples=1024)
+    check(preproc.pad, 10, 'first')
+    check(preproc.truncate, 10, 'last')
+    check(preproc.shiftToRef, 3.0, testHdrs['bandwidth'], testHdrs['centralFrequency'], ppmlim=(1.0, 5.0))
+
+    # Timeshift matches linear interpolation
+    taxis = np.arange(testFIDs[0].size) * dt
+    shifted, _ = preproc.timeshift(testFIDs[0], dt, 0.0015, 0.0)
+    newtaxis = np.arange(taxis[0] + 0.0015, taxis[-1], dt)
+    assert np.allclose(shifted, np.interp(newtaxis, taxis, testFIDs[0], left=0.0, right=0.0))
+
+
 # Test hlsvd by removing one peak from a two peak fid
 def test_hlsvd():
     # low noise
@@ -230,6 +285,63 @@ def test_phaseCorrect():
                                                shift=False)
     assert np.isclose(phs, -np.pi / 2, atol=1E-2)
 
+    # A stack of FIDs is phased FID by FID
+    stack = np.stack([testFIDs[0] * np.exp(1j * p) for p in (0.0, 0.5, -1.0)])
+    corrected, phs, pos = preproc.phaseCorrect(stack,
+                                               testHdrs['bandwidth'],
+                                               testHdrs['centralFrequency'],
+                                               ppmlim=(-0.5, 0.5),
+                                               shift=False)
+    assert phs.shape == (3,)
+    assert pos.shape == (3,)
+    assert np.allclose(phs, -np.pi / 2 - np.array([0.0, 0.5, -1.0]), atol=1E-2)
+    assert np.allclose(corrected, corrected[0])
+
+    # HLSVD is skipped when the peak in the limits dominates
+    skipped, phs_skipped, _ = preproc.phaseCorrect(testFIDs[0],
+                                                   testHdrs['bandwidth'],
+                                                   testHdrs['centralFrequency'],
+                                                   ppmlim=(-0.5, 0.5),
+                                                   shift=False,
+                                                   use_hlsvd=True)
+    no_hlsvd, phs_no_hlsvd, _ = preproc.phaseCorrect(testFIDs[0],
+                                                     testHdrs['bandwidth'],
+                                                     testHdrs['centralFrequency'],
+                                                     ppmlim=(-0.5, 0.5),
+                                                     shift=False)
+    assert phs_skipped == phs_no_hlsvd
+    assert np.allclose(skipped, no_hlsvd)
+
+
+def _phaseCorrect_padded(FID, bw, cf, ppmlim, shift):
+    """Original phaseCorrect search: maximum of the 4x zero-filled spectrum in ppmlim."""
+    from fsl_mrs.utils.misc import extract_spectrum
+    padFID = preproc.pad(FID, FID.size * 3)
+    mrs = MRS(FID=padFID, bw=bw, cf=cf)
+    spec = extract_spectrum(mrs, padFID, ppmlim=ppmlim, shift=shift)
+    maxIndex = np.argmax(np.abs(spec))
+    return -np.angle(spec[maxIndex]), int(np.round(maxIndex / 4))
+
+
+def test_phaseCorrect_padded_maximum():
+    # Low SNR and two similar peaks in the limits, where the maximum
+    # must be taken over the whole zero-filled window.
+    np.random.seed(0)
+    # 4095 points (as the repo SVS test data) is not a fast FFT length.
+    for points in (512, 2048, 4095):
+        for amplitude, noise in (([1.0, 1.0], 1E-2), ([1.0, 0.95], 1E-4), ([0.1, 0.1], 1E-1)):
+            for _ in range(8):
+                testFIDs, testHdrs = syn.syntheticFID(amplitude=amplitude,
+                                                      chemicalshift=[1.9, 2.1],
+                                                      phase=np.random.uniform(-np.pi, np.pi, 2).tolist(),
+                                                      points=points,
+                                                      noisecovariance=[[noise]])
+                bw, cf = testHdrs['bandwidth'], testHdrs['centralFrequency']
+                _, phs, pos = preproc.phaseCorrect(testFIDs[0], bw, cf, ppmlim=(1.5, 2.5))
+                phs_ref, pos_ref = _phaseCorrect_padded(testFIDs[0], bw, cf, (1.5, 2.5), True)
+                assert pos == pos_ref
+                assert np.isclose(np.exp(1j * phs), np.exp(1j * phs_ref))
+
 
 def test_add_subtract():
     mockFID = np.random.random(1024) + 1j * np.random.random(1024)
@@ -297,3 +409,25 @@ def test_shiftToRef():
     position = mrs.getAxes(axis='ppm')[maxindex]
 
     assert np.isclose(position, -2.0, atol=1E-1)
+
+
+def test_single_precision():
+    # Element-wise kernels keep complex64 data in single precision
+    fids, hdr = syn.syntheticFID(noisecovariance=[[1E-3]], points=512)
+    fid = fids[0]
+    fid32 = fid.astype(np.complex64)
+    dt = hdr['dwelltime']
+
+    for func, args in ((preproc.apodize, (dt, [10])),
+                       (preproc.freqshift, (dt, 10.0)),
+                       (preproc.eddy_correct, (fid32,)),
+                       (preproc.applyPhase, (0.5,))):
+        out32 = func(fid32, *args)
+        assert out32.dtype == np.complex64
+        assert np.allclose(out32, func(fid, *args), atol=1E-5)
+
+    out32, phs32, _ = preproc.phaseCorrect(fid32, hdr['bandwidth'], hdr['centralFrequency'])
+    out, phs, _ = preproc.phaseCorrect(fid, hdr['bandwidth'], hdr['centralFrequency'])
+    assert out32.dtype == np.complex64
+    assert np.isclose(phs32, phs, atol=1E-5)
+    assert np.allclose(out32, out, atol=1E-5)
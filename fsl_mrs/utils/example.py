@@ -6,7 +6,7 @@
 # Copyright (C) 2019 University of Oxford
 # SHBASECOPYRIGHT
 
-from fsl_mrs.utils import mrs_io, misc
+from fsl_mrs.utils import mrs_io
 from fsl_mrs.core import MRS
 from pathlib import Path
 
@@ -50,6 +50,7 @@ def dMRS(mouse='mouse1', path='/Users/saad/Desktop/Spectroscopy/'):
         mrs Object list
         list (time variable)
     """
+    from concurrent.futures import ThreadPoolExecutor
     from scipy.io import loadmat
     from fsl_mrs.utils.preproc.phasing import phaseCorrect
     from fsl_mrs.utils.preproc.align import phase_freq_align
@@ -66,18 +67,21 @@ def dMRS(mouse='mouse1', path='/Users/saad/Desktop/Spectroscopy/'):
 
     currentdir = dataPath / mouse
 
-    fidList = []
     blist = [20, 3000, 6000, 10000, 20000, 30000, 50000]
-    for b in blist:
-        file = currentdir / f'high_b_{str(b)}.mat'
-        tmp = loadmat(file)
+
+    def load_one(b):
+        tmp = loadmat(currentdir / f'high_b_{str(b)}.mat')
         fid = np.squeeze(tmp['soustraction'].conj())
         fid, _, _ = phaseCorrect(fid,
                                  bandwidth,
                                  centralFrequency,
                                  ppmlim=(2.8, 3.2),
                                  shift=True)
-        fidList.append(fid)
+        return fid
+
+    # Each b-value is independent, overlap the file reads and phasing.
+    with ThreadPoolExecutor(max_workers=len(blist)) as ex:
+        fidList = list(ex.map(load_one, blist))
 
     # Align and shift to Cr reference.
     alignedFids, _, _ = phase_freq_align(fidList,
@@ -122,6 +126,7 @@ def dMRS_SNR(avg=1, path='/Users/saad/Desktop/Spectroscopy/'):
         bvals
 
     """
+    from concurrent.futures import ThreadPoolExecutor
     from fsl_mrs.utils import mrs_io
 
     path = Path(path)
@@ -131,15 +136,14 @@ def dMRS_SNR(avg=1, path='/Users/saad/Desktop/Spectroscopy/'):
 
     FIDpath = path / f'DMRS/WT_multi/{avg:03}_avg'
     bvals   = [20, 3020, 6000, 10000, 20000, 30000, 50000]
-    MRSlist = []
-    for b in bvals:
-        FID = mrs_io.read_FID(str(FIDpath / f'b_{b:05}.nii.gz'))
-        MRSArgs = {'basis': basis,
-                   'names': names,
-                   'basis_hdr': Bheader[0]}
+    with ThreadPoolExecutor(max_workers=len(bvals)) as ex:
+        FIDs = list(ex.map(mrs_io.read_FID,
+                           [str(FIDpath / f'b_{b:05}.nii.gz') for b in bvals]))
 
-        mrs = FID.mrs(**MRSArgs)
-        MRSlist.append(mrs)
+    MRSArgs = {'basis': basis,
+               'names': names,
+               'basis_hdr': Bheader[0]}
+    MRSlist = [FID.mrs(**MRSArgs) for FID in FIDs]
 
     MRSlist[0].rescaleForFitting()
     for i, mrs in enumerate(MRSlist):
@@ -229,7 +233,6 @@ def MPRESS(noise=1, path='/Users/saad/Desktop/Spectroscopy/'):
                basis_hdr=basis_hdr[0],
                names=names)
     mrs1.check_FID(repair=True)
-    mrs1.Spec = misc.FIDToSpec(mrs1.FID)
     mrs1.check_Basis(repair=True)
 
     basis, names, basis_hdr = mrs_io.read_basis(mpress_off)
@@ -240,7 +243,6 @@ def MPRESS(noise=1, path='/Users/saad/Desktop/Spectroscopy/'):
                basis_hdr=basis_hdr[0],
                names=names)
     mrs2.check_FID(repair=True)
-    mrs2.Spec = misc.FIDToSpec(mrs2.FID)
     mrs2.check_Basis(repair=True)
 
     return [mrs1, mrs2], [0, 1]
@@ -7,6 +7,7 @@
 # SHBASECOPYRIGHT
 
 import numpy as np
+import scipy.fft as sfft
 from scipy.signal import butter, lfilter
 from scipy.interpolate import interp1d
 import itertools as it
@@ -45,10 +46,11 @@ def FIDToSpec(FID, axis=0):
     ss[axis] = slice(0, 1)
     ss = tuple(ss)
     FID[ss] *= 0.5
-    out = np.fft.fftshift(np.fft.fft(FID,
-                                     axis=axis,
-                                     norm='ortho'),
-                          axes=axis)
+    out = sfft.fftshift(sfft.fft(FID,
+                                 axis=axis,
+                                 norm='ortho',
+                                 workers=-1),
+                        axes=axis)
     FID[ss] *= 2
     return out
 
@@ -64,9 +66,11 @@ def SpecToFID(spec, axis=0):
         Returns:
             x (np.array)        : array of FIDs
     """
-    fid = np.fft.ifft(np.fft.ifftshift(spec,
-                                       axes=axis),
-                      axis=axis, norm='ortho')
+    # ifftshift returns a new array, so the transform can work in place.
+    fid = sfft.ifft(sfft.ifftshift(spec,
+                                   axes=axis),
+                    axis=axis, norm='ortho',
+                    overwrite_x=True, workers=-1)
     ss = [slice(None) for i in range(fid.ndim)]
     ss[axis] = slice(0, 1)
     ss = tuple(ss)
@@ -6,7 +6,7 @@
 # Copyright (C) 2020 University of Oxford
 # SHBASECOPYRIGHT
 
-import scipy.signal as ss
+import scipy.fft as sfft
 import numpy as np
 import os
 import re
@@ -25,28 +25,35 @@ def readLCModelRaw(filename, unpack_header=True, conjugate=True):
     :return: data
     :return: header
     """
-    header = []
-    data   = []
-    in_header = False
     with open(filename, 'r') as f:
-        for line in f:
-            if (line.find('$') > 0):
-                in_header = True
-            if in_header:
-                header.append(line)
-            else:
-                data.append(list(map(float, line.split())))
-
-            if line.find('$END') > 0:
-                in_header = False
+        text = f.read()
 
-    # Reshape data
-    data = np.concatenate([np.array(i) for i in data])
-    data = (data[0::2] + 1j * data[1::2]).astype(complex)
+    # Header sections (from the line with a '$' up to the line with
+    # '$END') may be interleaved with data (.BASIS), so jump between
+    # sections rather than inspecting every data line.
+    header = []
+    data = []
+    pos = 0
+    while True:
+        start = text.find('$', pos)
+        if start < 0:
+            break
+        start = text.rfind('\n', 0, start) + 1
+        end = text.find('$END', start)
+        end = len(text) if end < 0 else text.find('\n', end) + 1 or len(text)
+        data.append(text[pos:start])
+        header.extend(text[start:end].splitlines(keepends=True))
+        pos = end
+    data.append(text[pos:])
+
+    # Parse all data lines in one go. Values are interleaved real/imag
+    # pairs so the float buffer can be viewed as complex without a copy.
+    data = np.fromstring(' '.join(data), dtype=float, sep=' ')
+    data = data.view(complex)
 
     # LCModel-specific conjugation
     if conjugate:
-        data = np.conj(data)
+        np.conj(data, out=data)
 
     # Tidy header info
     if unpack_header:
@@ -64,7 +71,7 @@ def read_lcm_raw_h2o(filename):
     :return: NIFTI_MRS
     """
     data, header = readLCModelRaw(filename)
-    data = data.reshape((1, 1, 1) + data.shape)
+    data = data[None, None, None, :]
 
     return gen_new_nifti_mrs(data, header['dwelltime'], header['centralFrequency'])
 
@@ -76,15 +83,26 @@ def read_basis_files(basisfiles, ignore=[]):
      Assumes .RAW files are FIDs (not spectra)
      Comes without any header information unfortunately.
     """
-    basis = []
+    files = []
     names = []
     for file in basisfiles:
-        data, header = readLCModelRaw(file)
         name = os.path.splitext(os.path.split(file)[-1])[-2]
         if name not in ignore:
             names.append(name)
-            basis.append(data)
-    basis = np.asarray(basis).astype(complex).T
+            files.append(file)
+
+    if len(files) == 0:
+        return np.asarray([], dtype=complex), names
+
+    # Fill output array directly as each file is read, sized by the first file.
+    # Fortran order keeps each metabolite FID contiguous.
+    first, _ = readLCModelRaw(files[0])
+    basis = np.empty((first.size, len(files)), dtype=complex, order='F')
+    basis[:, 0] = first
+    for idx, file in enumerate(files[1:], start=1):
+        data, _ = readLCModelRaw(file)
+        basis[:, idx] = data
+
     return basis, names
 
 
@@ -118,20 +136,21 @@ def readLCModelBasis(filename, N=None, doifft=True, conjugate=True):
         data = data.reshape(len(metabo), -1).T
 
     # apply ppm shift found in header
-    for idx in range(data.shape[1]):
-        data[:, idx] = np.roll(data[:, idx], -shifts[idx])
+    # Equivalent to np.roll(data[:, idx], -shifts[idx]) on each column
+    roll_idx = (np.arange(data.shape[0])[:, None] + np.asarray(shifts)[None, :]) % data.shape[0]
+    data = np.take_along_axis(data, roll_idx, axis=0)
 
     # Resample if necessary? --> should not be allowed actually
-    if N is not None:
-        if N != data.shape[0]:
-            data = ss.resample(data, N)
-
     # if freq domain --> turn to time domain
-    if doifft:
-        data = np.fft.ifft(data, axis=0)
+    # All metabolites share one length N transform along axis 0.
+    if N is not None and N != data.shape[0]:
+        data = fourier_resample(data, N, doifft=doifft)
+    elif doifft:
+        data = sfft.ifft(data, axis=0, workers=-1)
 
+    # data is a fresh array at this point (roll/resample/ifft all copy)
     if conjugate:
-        data = np.conj(data)
+        np.conj(data, out=data)
 
     # deal with single metabo case
     if len(data.shape) == 1:
@@ -150,6 +169,41 @@ def readLCModelBasis(filename, N=None, doifft=True, conjugate=True):
 
 
 # Utility functions for above functions
+def fourier_resample(data, N, doifft=False):
+    """
+    Resample data to N points along the first axis by cropping or
+    zero-padding its FFT. Matches scipy.signal.resample for complex data.
+
+    If doifft is True the inverse FFT of the resampled data is returned.
+    The inverse FFT of the resampling output is just the cropped/padded
+    FFT reversed, so only a single forward transform is needed.
+    """
+    M = data.shape[0]
+    X = sfft.fft(data, axis=0, workers=-1)
+    Y = np.zeros((N,) + data.shape[1:], dtype=complex)
+
+    # Copy positive (inc. Nyquist) and negative frequency components
+    n = min(N, M)
+    nyq = n // 2 + 1
+    Y[:nyq] = X[:nyq]
+    if n > 2:
+        Y[nyq - n:] = X[nyq - n:]
+
+    # Split/join Nyquist component(s) if present
+    if n % 2 == 0:
+        if N < M:
+            Y[-n // 2] += X[-n // 2]
+        else:
+            Y[n // 2] *= 0.5
+            Y[N - n // 2] = Y[n // 2]
+
+    if doifft:
+        # ifft(ifft(Y))[k] = Y[-k] / N
+        return np.roll(Y[::-1], 1, axis=0) / M
+    else:
+        return sfft.ifft(Y, axis=0, workers=-1) * (N / M)
+
+
 def tidy(x):
     """
       removes ',' from string x
@@ -157,6 +211,12 @@ def tidy(x):
     return x.lower().replace(',', '')
 
 
+# Matches the header fields used by unpackHeader, e.g. " HZPPPM =  123.261703,"
+# Longer key names written by other tools (e.g. ECHOTIME) are also accepted.
+_HEADER_FIELD = re.compile(r'(hzpppm|dwelltime|echot|badelt)\w*\s*=\s*([-+]?[\d.]+(?:e[-+]?\d+)?)',
+                           re.IGNORECASE)
+
+
 def unpackHeader(header):
     """
        Extracts useful info from header into dict
@@ -169,16 +229,16 @@ def unpackHeader(header):
     tidy_header['bandwidth'] = None
     tidy_header['echotime'] = None
     for line in header:
-        if line.lower().find('hzpppm') > 0:
-            tidy_header['centralFrequency'] = float(tidy(line).split()[-1]) * 1E6
-        if line.lower().find('dwelltime') > 0:
-            tidy_header['dwelltime'] = float(tidy(line).split()[-1])
-            tidy_header['bandwidth'] = 1 / float(tidy(line).split()[-1])
-        if line.lower().find('echot') > 0:
-            tidy_header['echotime'] = float(tidy(line).split()[-1]) / 1e3  # convert to secs
-        if line.lower().find('badelt') > 0:
-            tidy_header['dwelltime'] = float(tidy(line).split()[-1])
-            tidy_header['bandwidth'] = 1 / float(tidy(line).split()[-1])
+        for key, value in _HEADER_FIELD.findall(line):
+            key = key.lower()
+            value = float(value)
+            if key == 'hzpppm':
+                tidy_header['centralFrequency'] = value * 1E6
+            elif key == 'echot':
+                tidy_header['echotime'] = value / 1e3  # convert to secs
+            else:  # dwelltime or badelt
+                tidy_header['dwelltime'] = value
+                tidy_header['bandwidth'] = 1 / value
 
     return tidy_header
 
@@ -229,19 +289,17 @@ def saveRAW(filename, FID, info=None, hdr=None, conj=False):
     elif 'FMTDAT' not in info:
         info.update({'FMTDAT': '(2E16.6)'})
 
-    rFID = np.real(FID)[:, None]
+    data = np.column_stack((np.real(FID), np.imag(FID)))
     if conj:
-        iFID = -1.0 * np.imag(FID)[:, None]
-    else:
-        iFID = np.imag(FID)[:, None]
+        data[:, 1] *= -1.0
 
     with open(filename, 'w') as my_file:
         if hdr is not None:
             writeLCMSection(my_file, 'SEQPAR', seqpar_header)
         writeLCMSection(my_file, 'NMID', info)
 
-        for (r, i) in zip(rFID, iFID):
-            my_file.write(f'{float(r):16.6E}{float(i):16.6E}\n')
+        # Matches FMTDAT (2E16.6), formatted as a single string
+        my_file.write(('%16.6E%16.6E\n' * data.shape[0]) % tuple(data.ravel().tolist()))
 
 
 def writeLcmInFile(outfile,
@@ -11,7 +11,7 @@
 from fsl_mrs.utils.preproc.general import get_target_FID, add, subtract
 from fsl_mrs.utils.preproc.filtering import apodize as apod
 from fsl_mrs.core import MRS
-from fsl_mrs.utils.misc import extract_spectrum, shift_FID
+from fsl_mrs.utils.misc import FIDToSpec, shift_FID
 from scipy.optimize import minimize
 import numpy as np
 
@@ -34,18 +34,15 @@ def align_FID(mrs, src_FID, tgt_FID, ppmlim=None, shift=True):
     """
     normalisation = np.linalg.norm(tgt_FID)
 
-    # Internal functions so they can see globals
-    def shift_phase_freq(FID, phi, eps, extract=True):
-        sFID = np.exp(-1j * phi) * shift_FID(mrs, FID, eps)
-        if extract:
-            sFID = extract_spectrum(mrs, sFID, ppmlim=ppmlim, shift=shift)
-        return sFID
+    # Terms which don't depend on the fitted parameters are computed once.
+    first, last = mrs.ppmlim_to_range(ppmlim=ppmlim, shift=shift)
+    target = FIDToSpec(tgt_FID)[first:last]
+    freq_ramp = -1j * 2 * np.pi * mrs.timeAxis.ravel()
 
     def cf(p):
         phi    = p[0]  # phase shift
         eps    = p[1]  # freq shift
-        FID    = shift_phase_freq(src_FID, phi, eps)
-        target = extract_spectrum(mrs, tgt_FID, ppmlim=ppmlim, shift=shift)
+        FID    = FIDToSpec(np.exp(-1j * phi) * (src_FID * np.exp(freq_ramp * eps)))[first:last]
         xx     = np.linalg.norm((FID - target) / normalisation)
         return xx
     x0 = np.array([0, 0])
@@ -74,27 +71,24 @@ def align_FID_diff(mrs, src_FID0, src_FID1, tgt_FID, diffType='add', ppmlim=None
     """
     normalisation = np.linalg.norm(tgt_FID)
 
-    # Internal functions so they can see globals
-    def shift_phase_freq(FID0, FID1, phi, eps, extract=True):
-        sFID = np.exp(-1j * phi) * shift_FID(mrs, FID0, eps)
-        if extract:
-            sFID = extract_spectrum(mrs, sFID, ppmlim=ppmlim, shift=shift)
-            FID1 = extract_spectrum(mrs, FID1, ppmlim=ppmlim, shift=shift)
-
-        if diffType.lower() == 'add':
-            FIDOut = add(FID1, sFID)
-        elif diffType.lower() == 'sub':
-            FIDOut = subtract(FID1, sFID)
-        else:
-            raise ValueError('diffType must be add or sub.')
+    if diffType.lower() == 'add':
+        combine = add
+    elif diffType.lower() == 'sub':
+        combine = subtract
+    else:
+        raise ValueError('diffType must be add or sub.')
 
-        return FIDOut
+    # Terms which don't depend on the fitted parameters are computed once.
+    first, last = mrs.ppmlim_to_range(ppmlim=ppmlim, shift=shift)
+    target = FIDToSpec(tgt_FID)[first:last]
+    spec1 = FIDToSpec(src_FID1)[first:last]
+    freq_ramp = -1j * 2 * np.pi * mrs.timeAxis.ravel()
 
     def cf(p):
         phi    = p[0]  # phase shift
         eps    = p[1]  # freq shift
-        FID    = shift_phase_freq(src_FID0, src_FID1, phi, eps)
-        target = extract_spectrum(mrs, tgt_FID, ppmlim=ppmlim, shift=shift)
+        sFID   = FIDToSpec(np.exp(-1j * phi) * (src_FID0 * np.exp(freq_ramp * eps)))[first:last]
+        FID    = combine(spec1, sFID)
         xx     = np.linalg.norm((FID - target) / normalisation)
         return xx
 
@@ -146,7 +140,8 @@ def phase_freq_align(FIDlist,
     --------
     list of FID aligned to each other
     """
-    all_FIDs = FIDlist.copy()
+    # Stack (and copy) FIDs, (transients x time)
+    all_FIDs = np.array(FIDlist)
 
     phiOut, epsOut = np.zeros(len(FIDlist)), np.zeros(len(FIDlist))
     for iter in range(niter):
@@ -161,27 +156,31 @@ def phase_freq_align(FIDlist,
 
         if apodize > 0:
             target = apod(target, mrs.dwellTime, [apodize])
+            FIDs_apod = apod(all_FIDs, mrs.dwellTime, [apodize])
+        else:
+            FIDs_apod = all_FIDs
 
-        for idx, FID in enumerate(all_FIDs):
+        phi, eps = np.zeros(len(all_FIDs)), np.zeros(len(all_FIDs))
+        for idx, FID_apod in enumerate(FIDs_apod):
             if verbose:
                 print(f'... aligning FID number {idx}\r')
 
-            if apodize > 0:
-                FID_apod = apod(FID.copy(), mrs.dwellTime, [apodize])
-            else:
-                FID_apod = FID
-
-            phi, eps = align_FID(mrs,
-                                 FID_apod,
-                                 target,
-                                 ppmlim=ppmlim,
-                                 shift=shift)
-
-            all_FIDs[idx] = np.exp(-1j * phi) * shift_FID(mrs, FID, eps)
-            phiOut[idx] += phi
-            epsOut[idx] += eps
+            phi[idx], eps[idx] = align_FID(mrs,
+                                           FID_apod,
+                                           target,
+                                           ppmlim=ppmlim,
+                                           shift=shift)
+
+        # Apply this iteration's corrections to all FIDs at once
+        freq_ramp = -1j * 2 * np.pi * mrs.timeAxis.ravel()
+        all_FIDs = np.exp(-1j * phi)[:, None] * (all_FIDs * np.exp(freq_ramp * eps[:, None]))
+        phiOut += phi
+        epsOut += eps
         if verbose:
             print('\n')
+
+    if isinstance(FIDlist, list):
+        all_FIDs = list(all_FIDs)
     return all_FIDs, phiOut, epsOut
 
 
@@ -416,20 +415,18 @@ def phase_freq_align_diff_report(inFIDs0,
     fig.layout.yaxis2.update(title_text='Shift (Hz)')
     fig.layout.xaxis2.update(title_text='Transient #')
 
-    diffFIDListIn = []
-    diffFIDListOut = []
-    for fid0i, fid1i, fid0o, fid1o in zip(inFIDs0, inFIDs1, outFIDs0, outFIDs1):
-        if diffType.lower() == 'add':
-            diffFIDListIn.append(add(fid1i, fid0i))
-            diffFIDListOut.append(add(fid1o, fid0o))
-        elif diffType.lower() == 'sub':
-            diffFIDListIn.append(subtract(fid1i, fid0i))
-            diffFIDListOut.append(subtract(fid1o, fid0o))
-        else:
-            raise ValueError('diffType must be add or sub.')
+    if diffType.lower() == 'add':
+        diff_func = add
+    elif diffType.lower() == 'sub':
+        diff_func = subtract
+    else:
+        raise ValueError('diffType must be add or sub.')
+    diffFIDsIn = diff_func(np.asarray(inFIDs1), np.asarray(inFIDs0))
+    diffFIDsOut = diff_func(np.asarray(outFIDs1), np.asarray(outFIDs0))
 
-    meanIn = combine_FIDs(diffFIDListIn, 'mean')
-    meanOut = combine_FIDs(diffFIDListOut, 'mean')
+    # Transpose so time dimension is first
+    meanIn = combine_FIDs(diffFIDsIn.T, 'mean')
+    meanOut = combine_FIDs(diffFIDsOut.T, 'mean')
 
     def toMRSobj(fid):
         return MRS(FID=fid, cf=cf, bw=bw, nucleus=nucleus)
@@ -443,9 +440,9 @@ def phase_freq_align_diff_report(inFIDs0,
         axis = 'ppm'
 
     toPlotIn, toPlotOut = [], []
-    for fid in diffFIDListIn:
+    for fid in diffFIDsIn:
         toPlotIn.append(toMRSobj(fid))
-    for fid in diffFIDListOut:
+    for fid in diffFIDsOut:
         toPlotOut.append(toMRSobj(fid))
 
     def addline(fig, mrs, lim, name, linestyle):
@@ -6,6 +6,8 @@
 # Copyright (C) 2019 University of Oxford
 # SHBASECOPYRIGHT
 
+import os
+
 import numpy as np
 
 
@@ -23,7 +25,8 @@ def prewhiten(FIDlist, prop=.1, C=None):
 
     Parameters:
     -----------
-    FIDlist : list of FIDs
+    FIDlist : list of FIDs, or array (time x coils). Arrays with
+              additional leading dimensions are processed as a batch.
     prop    : proportion of data used to estimate noise covariance
     C       : noise covariance matrix, if provided it is not measured from data.
 
@@ -35,20 +38,46 @@ def prewhiten(FIDlist, prop=.1, C=None):
     FIDs = np.asarray(FIDlist, dtype=complex)
     if C is None:
         # Estimate noise covariance
-        start = int((1 - prop) * FIDs.shape[0])
+        npoints = FIDs.shape[-2]
+        start = int((1 - prop) * npoints)
         # Raise warning if not enough samples
-        if (FIDs.shape[0] - start) < 1.5 * FIDs.shape[1]:
+        if (npoints - start) < 1.5 * FIDs.shape[-1]:
             raise(Warning('You may not have enough samples to robustly estimate the noise covariance'))
-        C     = np.cov(FIDs[start:, :], rowvar=False)
+        # Equivalent to np.cov(rowvar=False), but over any leading dimensions
+        noise = FIDs[..., start:, :]
+        noise = noise - noise.mean(axis=-2, keepdims=True)
+        C = np.swapaxes(noise, -1, -2) @ noise.conj() / (npoints - start - 1)
 
     D, V = np.linalg.eigh(C, UPLO='U')  # UPLO = 'U' to match matlab implementation
     # Pre-whitening matrix
-    W = V @ np.diag(1 / np.sqrt(D))
+    W = V / np.sqrt(D)[..., None, :]
     # Pre-whitened data
     FIDs = FIDs @ W
     return FIDs, W, C
 
 
+def _gram_eigh(FIDs):
+    """Eigendecomposition of the (coils x coils) Gram matrix of FIDs.
+
+    Batches of FIDs (more than two dimensions) are decomposed on the GPU
+    if the FSLMRS_GPU environment variable is set and CuPy is installed.
+
+    :param FIDs: Array of FIDs (... x time x coils)
+    :return: Eigenvalues (ascending) and eigenvectors, as numpy arrays
+    """
+    if FIDs.ndim > 2 and os.environ.get('FSLMRS_GPU'):
+        try:
+            import cupy as cp
+        except ImportError:
+            pass
+        else:
+            FIDs_gpu = cp.asarray(FIDs)
+            S2, E = cp.linalg.eigh(cp.swapaxes(FIDs_gpu.conj(), -1, -2) @ FIDs_gpu)
+            return cp.asnumpy(S2), cp.asnumpy(E)
+
+    return np.linalg.eigh(np.swapaxes(FIDs.conj(), -1, -2) @ FIDs)
+
+
 def svd_reduce(FIDlist, W=None, C=None, return_alpha=False):
     """
     Combine different channels by SVD method
@@ -56,7 +85,8 @@ def svd_reduce(FIDlist, W=None, C=None, return_alpha=False):
 
     Parameters:
     -----------
-    FIDlist      : list of FIDs
+    FIDlist      : list of FIDs, or array (time x coils). Arrays with
+                   additional leading dimensions are processed as a batch.
     W            : pre-whitening matrix (only used to calculate sensitivities)
     return_alpha : return sensitivities?
 
@@ -66,33 +96,39 @@ def svd_reduce(FIDlist, W=None, C=None, return_alpha=False):
     array-like (sensitivities) - optional
     """
     FIDs  = np.asarray(FIDlist)
-    U, S, V = np.linalg.svd(FIDs, full_matrices=False)
-    # U,S,V = svds(FIDs,k=1)  #this is much faster but fails for two coil case
+    # Only the first singular vectors are needed. Take them from the
+    # eigendecomposition of the (coils x coils) Gram matrix rather than
+    # computing the full SVD of the (time x coils) data.
+    # The arbitrary phase of the eigenvector cancels in svdRescale below.
+    S2, E = _gram_eigh(FIDs)
+    V0 = E[..., :, -1].conj()                    # First row of V
+    US0 = (FIDs @ E[..., :, -1:])[..., 0]        # U[:, 0] * S[0]
 
     # nCoils = FIDs.shape[1]
+    # S = np.sqrt(np.abs(S2[::-1]))
     # svdQuality = ((S[0] / np.linalg.norm(S)) * np.sqrt(nCoils) - 1) / (np.sqrt(nCoils) - 1)
 
     # get arbitrary amplitude
-    iW = np.eye(FIDs.shape[1])
-    if W is not None:
-        iW = np.linalg.inv(W)
-    amp = V[0, :] @ iW
+    if W is None:
+        amp = V0
+    else:
+        amp = (V0[..., None, :] @ np.linalg.inv(W))[..., 0, :]
 
     # arbitrary scaling here such that the first coil weight is real and positive
-    svdRescale = np.linalg.norm(amp) * (amp[0] / np.abs(amp[0]))
+    svdRescale = np.linalg.norm(amp, axis=-1) * (amp[..., 0] / np.abs(amp[..., 0]))
 
     # combined channels
-    FID = U[:, 0] * S[0] * svdRescale
+    FID = US0 * svdRescale[..., None]
 
     if return_alpha:
         # sensitivities per channel
         # alpha = amp/svdRescale # equivalent to svdCoilAmplitudes in matlab implementation
 
         # Instead incorporate the effect of the whitening stage as well.
-        if C is None:
-            C = np.eye(FIDs.shape[1])
-        scaledAmps = (amp / svdRescale).conj().T
-        alpha = np.linalg.inv(C) @ scaledAmps * svdRescale.conj() * svdRescale
+        scaledAmps = (amp / svdRescale[..., None]).conj()
+        if C is not None:
+            scaledAmps = (np.linalg.inv(C) @ scaledAmps[..., None])[..., 0]
+        alpha = scaledAmps * (svdRescale.conj() * svdRescale)[..., None]
         return FID, alpha
     else:
         return FID
@@ -104,8 +140,9 @@ def weightedCombination(FIDlist, weights):
 
     Parameters:
     -----------
-    FIDlist      : list of FIDs
-    weights      : complex weights
+    FIDlist      : list of FIDs, or array (time x coils). Arrays with
+                   additional leading dimensions are processed as a batch.
+    weights      : complex weights, (coils) or (batch x coils)
 
     Returns:
     --------
@@ -116,7 +153,7 @@ def weightedCombination(FIDlist, weights):
     if isinstance(weights, list):
         weights = np.asarray(weights)
     # combine channels
-    FID = np.sum(FIDlist * weights[None, :], axis=1)
+    FID = np.einsum('...tc,...c->...t', FIDlist, weights)
 
     return FID
 
@@ -127,7 +164,8 @@ def combine_FIDs(FIDlist, method, do_prewhiten=False, do_dephase=False, weights=
 
     Parameters:
     -----------
-    FIDlist   : list of FIDs or array with time dimension first
+    FIDlist   : list of FIDs or array of (... x time x FIDs).
+                Every leading index of an array is combined at once.
     method    : one of 'mean', 'svd', 'svd_weights', 'weighted'
     prewhiten : bool
     dephase   : bool
@@ -139,7 +177,7 @@ def combine_FIDs(FIDlist, method, do_prewhiten=False, do_dephase=False, weights=
     """
 
     if isinstance(FIDlist, list):
-        FIDlist = np.asarray(FIDlist).T
+        FIDlist = np.stack(FIDlist, axis=-1)
 
     # Pre-whitening
     W = None
@@ -153,7 +191,7 @@ def combine_FIDs(FIDlist, method, do_prewhiten=False, do_dephase=False, weights=
 
     # Combining channels
     if method == 'mean':
-        return np.mean(FIDlist, axis=-1).T
+        return np.mean(FIDlist, axis=-1)
     elif method == 'svd':
         return svd_reduce(FIDlist, W)
     elif method == 'svd_weights':
@@ -23,8 +23,14 @@ def eddy_correct(FIDmet, FIDPhsRef):
     --------
     array-like (corrected metabolite FID)
     """
-    phsRef = np.angle(FIDPhsRef)
-    return np.abs(FIDmet) * np.exp(1j * (np.angle(FIDmet) - phsRef))
+    # Unit phasor conj(ref)/|ref| removes the reference phase without
+    # evaluating angle/exp. Zero valued reference points apply no rotation.
+    FIDPhsRef = np.asarray(FIDPhsRef)
+    mag = np.abs(FIDPhsRef)
+    rotation = np.divide(FIDPhsRef.conj(), mag,
+                         out=np.ones(FIDPhsRef.shape, dtype=np.result_type(FIDPhsRef.dtype, np.complex64)),
+                         where=mag > 0)
+    return FIDmet * rotation
 
 
 def eddy_correct_report(inFID,
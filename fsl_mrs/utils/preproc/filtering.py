@@ -6,6 +6,8 @@
 # Copyright (C) 2019 University of Oxford
 # SHBASECOPYRIGHT
 
+from functools import lru_cache
+
 import numpy as np
 
 
@@ -13,15 +15,43 @@ def apodize(FID, dwelltime, broadening, filter='exp'):
     """ Apodize FID
 
     Args:
-        FID (ndarray): Time domain data
+        FID (ndarray): Time domain data, time on the last axis
         dwelltime (float): dwelltime in seconds
         broadening (tuple,float): apodisation in Hz
         filter (str,optional):'exp','l2g'
 
     Returns:
-        FID (ndarray): Apodised FID
+        FID (ndarray): Apodised FID, same precision as input
     """
-    taxis = np.linspace(0, dwelltime * (FID.size - 1), FID.size)
+    window = apodization_window(FID.shape[-1], dwelltime, broadening, filter=filter)
+    return np.asarray(window, dtype=np.result_type(FID.real.dtype, np.float32)) * FID
+
+
+def apodization_window(npoints, dwelltime, broadening, filter='exp'):
+    """ Generate the apodization window applied by apodize
+
+    Windows are cached, repeated calls with the same arguments
+    return the same (read-only) array.
+
+    Args:
+        npoints (int): Number of time domain points
+        dwelltime (float): dwelltime in seconds
+        broadening (tuple,float): apodisation in Hz
+        filter (str,optional):'exp','l2g'
+
+    Returns:
+        window (ndarray): Window of length npoints (or 1 if filter not recognised)
+    """
+    if filter not in ('exp', 'l2g'):
+        print('Filter not recognised, should be "exp" or "l2g".')
+        return 1
+    return _apodization_window(int(npoints), float(dwelltime), tuple(broadening), filter)
+
+
+@lru_cache(maxsize=32)
+def _apodization_window(npoints, dwelltime, broadening, filter):
+    """Cached implementation of apodization_window, arguments must be hashable."""
+    taxis = np.linspace(0, dwelltime * (npoints - 1), npoints)
     if filter == 'exp':
         Tl = 1 / broadening[0]
         window = np.exp(-taxis / Tl)
@@ -29,10 +59,8 @@ def apodize(FID, dwelltime, broadening, filter='exp'):
         Tl = 1 / broadening[0]
         Tg = 1 / broadening[1]
         window = np.exp(taxis / Tl) * np.exp(taxis**2 / Tg**2)
-    else:
-        print('Filter not recognised, should be "exp" or "l2g".')
-        window = 1
-    return window * FID
+    window.flags.writeable = False
+    return window
 
 
 def apodize_report(inFID,
@@ -7,10 +7,13 @@ Author: Saad Jbabdi <saad@fmrib.ox.ac.uk>
 Copyright (C) 2021 University of Oxford
 SHBASECOPYRIGHT'''
 from datetime import datetime
+from functools import partial
+import multiprocessing as mp
 
 import numpy as np
 
 from fsl_mrs.utils import preproc
+from fsl_mrs.utils.preproc.filtering import apodization_window
 from fsl_mrs.core import NIFTI_MRS
 from fsl_mrs import __version__
 
@@ -34,11 +37,7 @@ def update_processing_prov(nmrs_obj: NIFTI_MRS, method, details):
     :param details: [description]
     :type details: str
     """
-    # 1. Check for ProcessingApplied key and create if not present
-    if 'ProcessingApplied' not in nmrs_obj.hdr_ext:
-        nmrs_obj.add_hdr_field('ProcessingApplied', [])
-
-    # 2. Form object to append.
+    # 1. Form object to append.
     prov_dict = {
         'Time': datetime.now().isoformat(sep='T', timespec='milliseconds'),
         'Program': 'FSL-MRS',
@@ -46,14 +45,102 @@ def update_processing_prov(nmrs_obj: NIFTI_MRS, method, details):
         'Method': method,
         'Details': details}
 
-    # 3. Append
-    current_processing = nmrs_obj.hdr_ext['ProcessingApplied']
-    current_processing.append(prov_dict)
-    nmrs_obj.add_hdr_field('ProcessingApplied', current_processing)
+    # 2. Append, creating the ProcessingApplied key if not present.
+    # The JSON extension is decoded and re-encoded once.
+    hdr_ext = nmrs_obj.hdr_ext
+    hdr_ext.setdefault('ProcessingApplied', []).append(prov_dict)
+    nmrs_obj.hdr_ext = hdr_ext
+
+
+_SLICE_ALL = slice(None)
+
+# Set True to run the memory bound element-wise operations (apodize, fshift, ecc,
+# phase_correct, apply_fixed_phase, subtract and add) in single precision.
+# By default they run in the precision of the input data.
+# Results are converted back to the data type of the input on output.
+USE_FP32 = False
+
+
+def _working_precision(arr):
+    """Return arr as complex64 if USE_FP32 is set, otherwise unchanged."""
+    if USE_FP32:
+        return arr.astype(np.complex64, copy=False)
+    return arr
 
 
 def first_index(idx):
-    return all([ii == slice(None, None, None) or ii == 0 for ii in idx])
+    return all(ii == _SLICE_ALL or ii == 0 for ii in idx)
+
+
+def _apply_vectorized(data, func, *args, **kwargs):
+    """Apply a preproc function to all FIDs in one call.
+
+    All FIDs are stacked into a (n_fids, n_points) array and passed to func,
+    which must operate along the last axis. The result is returned in the
+    NIfTI-MRS layout (time as the fourth dimension). If func returns a tuple
+    the first element is reshaped and the rest passed through.
+
+    :param data: Data to process, NIFTI_MRS or array in the same layout
+    :param func: Function taking the stacked FIDs as first argument
+    :return: Processed array (+ any extra outputs of func)
+    """
+    arr = np.moveaxis(data[:], 3, -1)
+    out = func(arr.reshape(-1, arr.shape[-1]), *args, **kwargs)
+
+    def unflatten(fids):
+        return np.moveaxis(fids.reshape(arr.shape[:-1] + fids.shape[-1:]), -1, 3)
+
+    if isinstance(out, tuple):
+        return (unflatten(out[0]),) + out[1:]
+    return unflatten(out)
+
+
+def _iterate_fids(arr, dim=None):
+    """Generator over the FIDs of an ndarray in NIfTI-MRS layout.
+
+    Equivalent to NIFTI_MRS.iterate_over_dims with iterate_over_space=True
+    (and reduce_dim_index=True if dim is given), but indexes the plain array.
+
+    :param arr: Data array, time as fourth dimension
+    :param int dim: Optional dimension index, returned as last axis of each FID
+    :return: FID (time x dim) and index
+    """
+    if dim is not None:
+        arr = np.moveaxis(arr, dim, -1)
+        loop_shape = arr.shape[:3] + arr.shape[4:-1]
+    else:
+        loop_shape = arr.shape[:3] + arr.shape[4:]
+    for ix in np.ndindex(loop_shape):
+        idx = ix[:3] + (_SLICE_ALL,) + ix[3:]
+        yield arr[idx], idx
+
+
+def _parallel_map(func, *iterables, n_jobs=1):
+    """Map func over the zipped iterables, returning a list of results.
+
+    Per-FID operations are independent, so they can be spread over a pool of
+    n_jobs processes (-1 for all cores). Runs serially by default, for a
+    single call or inside daemonic (pool worker) processes.
+    """
+    args = list(zip(*iterables))
+    if n_jobs is None or n_jobs < 0:
+        n_jobs = mp.cpu_count()
+    processes = min(n_jobs, len(args))
+    if processes < 2 or mp.current_process().daemon:
+        return [func(*arg) for arg in args]
+
+    with mp.Pool(processes=processes) as p:
+        return p.starmap(func, args, chunksize=max(1, len(args) // (4 * processes)))
+
+
+def _store_result(data, result, inplace):
+    """Return result as a NIFTI_MRS object. If inplace it is written
+    into data, otherwise a new object with the header (and data type)
+    of data is created."""
+    if inplace:
+        data[:] = result
+        return data
+    return NIFTI_MRS(result.astype(data.dtype, copy=False), header=data.header)
 
 
 def coilcombine(data, reference=None, no_prewhiten=False, figure=False, report=None, report_all=False):
@@ -67,51 +154,63 @@ def coilcombine(data, reference=None, no_prewhiten=False, figure=False, report=N
 
     :return: Combined data in NIFTI_MRS format.
     '''
+    bw = data.bandwidth
+    sf = data.spectrometer_frequency[0]
+    nuc = data.nucleus[0]
+    coil_dim = data.dim_position('DIM_COIL')
+    ncha = data.shape[coil_dim]
+
     if reference is not None:
-        if data.shape[data.dim_position('DIM_COIL')] != reference.shape[data.dim_position('DIM_COIL')]:
+        if ncha != reference.shape[coil_dim]:
             raise DimensionsDoNotMatch('Reference and data coil dimension does not match.')
 
-    combinedc_obj = data.copy(remove_dim='DIM_COIL')
-    for main, idx in data.iterate_over_dims(dim='DIM_COIL',
-                                            iterate_over_space=True,
-                                            reduce_dim_index=True):
-        if reference is None:
-            combinedc_obj[idx] = preproc.combine_FIDs(
-                list(main.T),
-                'svd',
-                do_prewhiten=~no_prewhiten)
-        else:
-            _, refWeights = preproc.combine_FIDs(
-                list(reference[idx[:4]].T),
-                'svd_weights',
-                do_prewhiten=~no_prewhiten)
-            combinedc_obj[idx] = preproc.combine_FIDs(
-                list(main.T),
-                'weighted',
-                weights=refWeights)
-
-        if (figure or report) and (report_all or first_index(idx)):
-            from fsl_mrs.utils.preproc.combine import combine_FIDs_report
-            fig = combine_FIDs_report(main,
-                                      combinedc_obj[idx],
-                                      data.bandwidth,
-                                      data.spectrometer_frequency[0],
-                                      data.nucleus[0],
-                                      ncha=data.shape[data.dim_position('DIM_COIL')],
-                                      ppmlim=(0.0, 6.0),
-                                      method='svd',
-                                      dim='DIM_COIL',
-                                      html=report)
-            if figure:
-                fig.show()
-
-    # Update processing prov
-    processing_info = f'{__name__}.coilcombine, '
+    # Combine all voxels and higher dimensions in one batch,
+    # arranged as (..., time, coil).
+    main = np.ascontiguousarray(np.moveaxis(data[:], (3, coil_dim), (-2, -1)))
     if reference is None:
-        processing_info += 'reference=None, '
+        combined = preproc.combine_FIDs(
+            main,
+            'svd',
+            do_prewhiten=~no_prewhiten)
     else:
-        processing_info += f'reference={reference.filename}, '
-    processing_info += f'no_prewhiten={no_prewhiten}.'
+        ref = np.ascontiguousarray(np.moveaxis(reference[:], (3, reference.dim_position('DIM_COIL')), (-2, -1)))
+        _, refWeights = preproc.combine_FIDs(
+            ref,
+            'svd_weights',
+            do_prewhiten=~no_prewhiten)
+        # Broadcast the per-voxel weights over any other higher dimensions
+        refWeights = refWeights.reshape(
+            refWeights.shape[:3] + (1,) * (main.ndim - 5) + refWeights.shape[-1:])
+        combined = preproc.combine_FIDs(
+            main,
+            'weighted',
+            weights=refWeights)
+
+    combinedc_obj = data.copy(remove_dim='DIM_COIL', empty=True)
+    combinedc_obj[:] = np.moveaxis(combined, -1, 3)
+
+    if figure or report:
+        for main, idx in data.iterate_over_dims(dim='DIM_COIL',
+                                                iterate_over_space=True,
+                                                reduce_dim_index=True):
+            if report_all or first_index(idx):
+                from fsl_mrs.utils.preproc.combine import combine_FIDs_report
+                fig = combine_FIDs_report(main,
+                                          combinedc_obj[idx],
+                                          bw,
+                                          sf,
+                                          nuc,
+                                          ncha=ncha,
+                                          ppmlim=(0.0, 6.0),
+                                          method='svd',
+                                          dim='DIM_COIL',
+                                          html=report)
+                if figure:
+                    fig.show()
+
+    # Update processing prov
+    ref_name = None if reference is None else reference.filename
+    processing_info = f'{__name__}.coilcombine, reference={ref_name}, no_prewhiten={no_prewhiten}.'
 
     update_processing_prov(combinedc_obj, 'RF coil combination', processing_info)
 
@@ -131,36 +230,37 @@ def average(data, dim, figure=False, report=None, report_all=False):
     :return: Combined data in NIFTI_MRS format.
     '''
 
-    combined_obj = data.copy(remove_dim=dim)
-    for dd, idx in data.iterate_over_dims(dim=dim,
-                                          iterate_over_space=True,
-                                          reduce_dim_index=True):
-        combined_obj[idx] = preproc.combine_FIDs(dd, 'mean')
-
-        if (figure or report) and (report_all or first_index(idx)):
-            from fsl_mrs.utils.preproc.combine import combine_FIDs_report
-            fig = combine_FIDs_report(dd,
-                                      combined_obj[idx],
-                                      data.bandwidth,
-                                      data.spectrometer_frequency[0],
-                                      data.nucleus[0],
-                                      ncha=data.shape[data.dim_position(dim)],
-                                      ppmlim=(0.0, 6.0),
-                                      method=f'Mean along dim = {dim}',
-                                      html=report)
-            if figure:
-                fig.show()
+    combined_obj = data.copy(remove_dim=dim, empty=True)
+    combined = preproc.combine_FIDs(np.moveaxis(data[:], data.dim_position(dim), -1), 'mean')
+
+    if figure or report:
+        for dd, idx in _iterate_fids(data[:], dim=data.dim_position(dim)):
+            if report_all or first_index(idx):
+                from fsl_mrs.utils.preproc.combine import combine_FIDs_report
+                fig = combine_FIDs_report(dd,
+                                          combined[idx],
+                                          data.bandwidth,
+                                          data.spectrometer_frequency[0],
+                                          data.nucleus[0],
+                                          ncha=data.shape[data.dim_position(dim)],
+                                          ppmlim=(0.0, 6.0),
+                                          method=f'Mean along dim = {dim}',
+                                          html=report)
+                if figure:
+                    fig.show()
+
+    combined_obj[:] = combined
 
     # Update processing prov
-    processing_info = f'{__name__}.average, '
-    processing_info += f'dim={dim}.'
+    processing_info = f'{__name__}.average, dim={dim}.'
 
     update_processing_prov(combined_obj, 'Signal averaging', processing_info)
 
     return combined_obj
 
 
-def align(data, dim, target=None, ppmlim=None, niter=2, apodize=10, figure=False, report=None, report_all=False):
+def align(data, dim, target=None, ppmlim=None, niter=2, apodize=10, figure=False, report=None, report_all=False,
+          inplace=False, n_jobs=1):
     '''Align frequency and phase of spectra. Can be run across a dimension (specified by a tag), or all spectra
     stored in higher dimensions.
 
@@ -173,66 +273,67 @@ def align(data, dim, target=None, ppmlim=None, niter=2, apodize=10, figure=False
     :param figure: True to show figure.
     :param report: Provide output location as path to generate report
     :param report_all: True to output all indicies
+    :param inplace: True to write the result into data rather than a copy.
+    :param int n_jobs: Number of processes to align with, -1 for all cores. Default 1 (serial).
 
     :return: Combined data in NIFTI_MRS format.
     '''
+    bw = data.bandwidth
+    sf = data.spectrometer_frequency[0]
+    nuc = data.nucleus[0]
 
-    aligned_obj = data.copy()
-
+    # Work in a contiguous time-last layout, so that each set of
+    # transients to align is a (transients x time) block.
     if dim.lower() == 'all':
-        generator = data.iterate_over_spatial()
+        # All higher dimensions of each voxel aligned together
+        moved_from, moved_to = 3, -1
+        loop_ndim = 3
     else:
-        generator = data.iterate_over_dims(dim=dim,
-                                           iterate_over_space=True,
-                                           reduce_dim_index=False)
-    for dd, idx in generator:
-
-        if dim == 'all':
-            # flatten
-            original_shape = dd.shape
-            dd = dd.reshape(original_shape[0], -1)
-
-        out = preproc.phase_freq_align(
-            dd.T,
-            data.bandwidth,
-            data.spectrometer_frequency[0],
-            nucleus=data.nucleus[0],
-            ppmlim=ppmlim,
-            niter=niter,
-            apodize=apodize,
-            verbose=False,
-            target=target)
-
-        if dim == 'all':
-            aligned_obj[idx], phi, eps = out[0].T.reshape(original_shape), out[1], out[2]
-        else:
-            aligned_obj[idx], phi, eps = out[0].T, out[1], out[2]
-
-        if (figure or report) and (report_all or first_index(idx)):
-            from fsl_mrs.utils.preproc.align import phase_freq_align_report
-            fig = phase_freq_align_report(dd.T,
-                                          out[0],
-                                          phi,
-                                          eps,
-                                          data.bandwidth,
-                                          data.spectrometer_frequency[0],
-                                          nucleus=data.nucleus[0],
-                                          ppmlim=ppmlim,
-                                          html=report)
-            if figure:
-                for ff in fig:
-                    ff.show()
+        moved_from, moved_to = (data.dim_position(dim), 3), (-2, -1)
+        loop_ndim = data.ndim - 2
+    arr = np.ascontiguousarray(np.moveaxis(data[:], moved_from, moved_to))
+    aligned = np.empty_like(arr)
+    indices = list(np.ndindex(arr.shape[:loop_ndim]))
+    fids = [arr[idx].reshape(-1, arr.shape[-1]) for idx in indices]
+
+    align_func = partial(preproc.phase_freq_align,
+                         bandwidth=bw,
+                         centralFrequency=sf,
+                         nucleus=nuc,
+                         ppmlim=ppmlim,
+                         niter=niter,
+                         apodize=apodize,
+                         verbose=False,
+                         target=target)
+    results = _parallel_map(align_func, fids, n_jobs=n_jobs)
+
+    for idx, out in zip(indices, results):
+        aligned[idx] = out[0].reshape(aligned[idx].shape)
+
+    if figure or report:
+        for fid, idx, out in zip(fids, indices, results):
+            if report_all or first_index(idx):
+                phi, eps = out[1], out[2]
+                from fsl_mrs.utils.preproc.align import phase_freq_align_report
+                fig = phase_freq_align_report(fid,
+                                              out[0],
+                                              phi,
+                                              eps,
+                                              bw,
+                                              sf,
+                                              nucleus=nuc,
+                                              ppmlim=ppmlim,
+                                              html=report)
+                if figure:
+                    for ff in fig:
+                        ff.show()
+
+    aligned_obj = _store_result(data, np.moveaxis(aligned, moved_to, moved_from), inplace)
 
     # Update processing prov
-    processing_info = f'{__name__}.align, '
-    processing_info += f'dim={dim}, '
-    if target is not None:
-        processing_info += 'target used, '
-    else:
-        processing_info += 'target=None, '
-    processing_info += f'ppmlim={ppmlim}, '
-    processing_info += f'niter={niter}, '
-    processing_info += f'apodize={apodize}.'
+    target_str = 'target=None' if target is None else 'target used'
+    processing_info = f'{__name__}.align, dim={dim}, {target_str}, '\
+                      f'ppmlim={ppmlim}, niter={niter}, apodize={apodize}.'
 
     update_processing_prov(aligned_obj, 'Frequency and phase correction', processing_info)
 
@@ -247,7 +348,8 @@ def aligndiff(data,
               ppmlim=None,
               figure=False,
               report=None,
-              report_all=False):
+              report_all=False,
+              n_jobs=1):
     '''Align frequencies of difference spectra across a dimension
     specified by a tag.
 
@@ -260,123 +362,136 @@ def aligndiff(data,
     :param figure: True to show figure.
     :param report: Provide output location as path to generate report
     :param report_all: True to output all indicies
+    :param int n_jobs: Number of processes to align with, -1 for all cores. Default 1 (serial).
 
     :return: Aligned data in NIFTI_MRS format.
     '''
+    bw = data.bandwidth
+    sf = data.spectrometer_frequency[0]
+    nuc = data.nucleus[0]
+
     if data.shape[data.dim_position(dim_diff)] != 2:
         raise DimensionsDoNotMatch('Diff dimension must be of length 2')
 
-    aligned_obj = data.copy()
     diff_index = data.dim_position(dim_diff)
-    data_0 = []
-    data_1 = []
-    index_0 = []
-    for dd, idx in data.iterate_over_dims(dim=dim_align,
-                                          iterate_over_space=True,
-                                          reduce_dim_index=False):
-        if idx[diff_index] == 0:
-            data_0.append(dd)
-            index_0.append(idx)
-        else:
-            data_1.append(dd)
-
-    for d0, d1, idx in zip(data_0, data_1, index_0):
-        out = preproc.phase_freq_align_diff(
-            d0.T,
-            d1.T,
-            data.bandwidth,
-            data.spectrometer_frequency[0],
-            nucleus=data.nucleus[0],
-            diffType=diff_type,
-            ppmlim=ppmlim,
-            target=target)
-
-        aligned_obj[idx], _, phi, eps = np.asarray(out[0]).T, out[1], out[2], out[3]
-
-        if (figure or report) and (report_all or first_index(idx)):
-            from fsl_mrs.utils.preproc.align import phase_freq_align_diff_report
-            fig = phase_freq_align_diff_report(d0.T,
-                                               d1.T,
-                                               aligned_obj[idx].T,
-                                               d1.T,
-                                               phi,
-                                               eps,
-                                               data.bandwidth,
-                                               data.spectrometer_frequency[0],
-                                               nucleus=data.nucleus[0],
-                                               diffType=diff_type,
-                                               ppmlim=ppmlim,
-                                               html=report)
-            if figure:
-                for ff in fig:
-                    ff.show()
+    align_index = data.dim_position(dim_align)
+
+    # Move (diff, align, time) dimensions last, sub-spectra are then
+    # contiguous blocks [..., 0, :, :] and [..., 1, :, :] of shape (align, time).
+    moved = (diff_index, align_index, 3)
+    aligned = np.ascontiguousarray(np.moveaxis(data[:], moved, (-3, -2, -1)))
+    indices = list(np.ndindex(aligned.shape[:-3]))
+    align_func = partial(preproc.phase_freq_align_diff,
+                         bandwidth=bw,
+                         centralFrequency=sf,
+                         nucleus=nuc,
+                         diffType=diff_type,
+                         ppmlim=ppmlim,
+                         target=target)
+    results = _parallel_map(align_func,
+                            [aligned[idx][0] for idx in indices],
+                            [aligned[idx][1] for idx in indices],
+                            n_jobs=n_jobs)
+
+    if figure or report:
+        for idx, out in zip(indices, results):
+            if report_all or first_index(idx):
+                d0, d1 = aligned[idx]
+                aligned_d0, _, phi, eps = np.asarray(out[0]), out[1], out[2], out[3]
+                from fsl_mrs.utils.preproc.align import phase_freq_align_diff_report
+                fig = phase_freq_align_diff_report(d0,
+                                                   d1,
+                                                   aligned_d0,
+                                                   d1,
+                                                   phi,
+                                                   eps,
+                                                   bw,
+                                                   sf,
+                                                   nucleus=nuc,
+                                                   diffType=diff_type,
+                                                   ppmlim=ppmlim,
+                                                   html=report)
+                if figure:
+                    for ff in fig:
+                        ff.show()
+
+    for idx, out in zip(indices, results):
+        aligned[idx][0] = out[0]
+
+    aligned_obj = NIFTI_MRS(np.moveaxis(aligned, (-3, -2, -1), moved), header=data.header)
 
     # Update processing prov
-    processing_info = f'{__name__}.aligndiff, '
-    processing_info += f'dim_align={dim_align}, '
-    processing_info += f'dim_diff={dim_diff}, '
-    processing_info += f'diff_type={diff_type}, '
-    if target is not None:
-        processing_info += 'target used, '
-    else:
-        processing_info += 'target=None, '
-    processing_info += f'ppmlim={ppmlim}.'
+    target_str = 'target=None' if target is None else 'target used'
+    processing_info = f'{__name__}.aligndiff, dim_align={dim_align}, dim_diff={dim_diff}, '\
+                      f'diff_type={diff_type}, {target_str}, ppmlim={ppmlim}.'
 
     update_processing_prov(aligned_obj, 'Alignment of subtraction sub-spectra', processing_info)
 
     return aligned_obj
 
 
-def ecc(data, reference, figure=False, report=None, report_all=False):
+def ecc(data, reference, figure=False, report=None, report_all=False, inplace=False):
     '''Apply eddy current correction using a reference dataset
     :param NIFTI_MRS data: Data to eddy current correct
     :param NIFTI_MRS reference: reference dataset to calculate phase
     :param figure: True to show figure.
     :param report: Provide output location as path to generate report
     :param report_all: True to output all indicies
+    :param inplace: True to write the result into data rather than a copy.
 
     :return: Corrected data in NIFTI_MRS format.
     '''
+    bw = data.bandwidth
+    sf = data.spectrometer_frequency[0]
+    nuc = data.nucleus[0]
+
     if data.shape != reference.shape\
             and reference.ndim > 4:
         raise DimensionsDoNotMatch('Reference and data shape must match'
                                    ' or reference must be single FID.')
 
-    corrected_obj = data.copy()
-    for dd, idx in data.iterate_over_dims(iterate_over_space=True):
+    if data.shape == reference.shape:
+        # Reference is the same shape as data, voxel-wise and spectrum-wise correction
+        ref_all = reference[:]
+    else:
+        # Only one reference FID per voxel, broadcast over higher dimensions.
+        ref_all = reference[:, :, :, :]
+        ref_all = ref_all.reshape(ref_all.shape + (1,) * (data.ndim - 4))
+    corrected = preproc.eddy_correct(_working_precision(data[:]),
+                                     _working_precision(ref_all))
 
-        if data.shape == reference.shape:
-            # Reference is the same shape as data, voxel-wise and spectrum-wise iteration
-            ref = reference[idx]
-        else:
-            # Only one reference FID, only iterate over spatial voxels.
-            ref = reference[idx[0], idx[1], idx[2], :]
-
-        corrected_obj[idx] = preproc.eddy_correct(dd, ref)
-
-        if (figure or report) and (report_all or first_index(idx)):
-            from fsl_mrs.utils.preproc.eddycorrect import eddy_correct_report
-            fig = eddy_correct_report(dd,
-                                      corrected_obj[idx],
-                                      ref,
-                                      data.bandwidth,
-                                      data.spectrometer_frequency[0],
-                                      nucleus=data.nucleus[0],
-                                      html=report)
-            if figure:
-                for ff in fig:
-                    ff.show()
+    if figure or report:
+        for dd, idx in data.iterate_over_dims(iterate_over_space=True):
+            if report_all or first_index(idx):
+                if data.shape == reference.shape:
+                    ref = reference[idx]
+                else:
+                    ref = reference[idx[0], idx[1], idx[2], :]
+
+                from fsl_mrs.utils.preproc.eddycorrect import eddy_correct_report
+                fig = eddy_correct_report(dd,
+                                          corrected[idx],
+                                          ref,
+                                          bw,
+                                          sf,
+                                          nucleus=nuc,
+                                          html=report)
+                if figure:
+                    for ff in fig:
+                        ff.show()
+
+    corrected_obj = _store_result(data, corrected, inplace)
 
     # Update processing prov
-    processing_info = f'{__name__}.ecc, '
-    processing_info += f'reference={reference.filename}.'
+    processing_info = f'{__name__}.ecc, reference={reference.filename}.'
 
     update_processing_prov(corrected_obj, 'Eddy current correction', processing_info)
 
     return corrected_obj
 
 
-def remove_peaks(data, limits, limit_units='ppm+shift', figure=False, report=None, report_all=False):
+def remove_peaks(data, limits, limit_units='ppm+shift', figure=False, report=None, report_all=False, inplace=False,
+                 n_jobs=1):
     '''Apply HLSVD to remove peaks from specta
     :param NIFTI_MRS data: Data to remove peaks from
     :param limits: ppm limits between which peaks will be removed
@@ -384,35 +499,48 @@ def remove_peaks(data, limits, limit_units='ppm+shift', figure=False, report=Non
     :param figure: True to show figure.
     :param report: Provide output location as path to generate report
     :param report_all: True to output all indicies
+    :param inplace: True to write the result into data rather than a copy.
+    :param int n_jobs: Number of HLSVD processes, -1 for all cores. Default 1 (serial).
 
     :return: Corrected data in NIFTI_MRS format.
     '''
-    corrected_obj = data.copy()
-    for dd, idx in data.iterate_over_dims(iterate_over_space=True):
-
-        corrected_obj[idx] = preproc.hlsvd(dd,
-                                           data.dwelltime,
-                                           data.spectrometer_frequency[0],
-                                           limits,
-                                           limitUnits=limit_units)
-
-        if (figure or report) and (report_all or first_index(idx)):
-            from fsl_mrs.utils.preproc.remove import hlsvd_report
-            fig = hlsvd_report(dd,
-                               corrected_obj[idx],
-                               limits,
-                               data.bandwidth,
-                               data.spectrometer_frequency[0],
-                               nucleus=data.nucleus[0],
-                               limitUnits=limit_units,
-                               html=report)
-            if figure:
-                fig.show()
+    bw = data.bandwidth
+    sf = data.spectrometer_frequency[0]
+    nuc = data.nucleus[0]
+    dt = data.dwelltime
+
+    arr = data[:]
+    corrected = np.empty_like(arr)
+    fids, indices = zip(*_iterate_fids(arr))
+    hlsvd_func = partial(preproc.hlsvd,
+                         dwelltime=dt,
+                         centralFrequency=sf,
+                         limits=limits,
+                         limitUnits=limit_units)
+    results = _parallel_map(hlsvd_func, fids, n_jobs=n_jobs)
+
+    for idx, res in zip(indices, results):
+        corrected[idx] = res
+
+    if figure or report:
+        for dd, idx, res in zip(fids, indices, results):
+            if report_all or first_index(idx):
+                from fsl_mrs.utils.preproc.remove import hlsvd_report
+                fig = hlsvd_report(dd,
+                                   res,
+                                   limits,
+                                   bw,
+                                   sf,
+                                   nucleus=nuc,
+                                   limitUnits=limit_units,
+                                   html=report)
+                if figure:
+                    fig.show()
+
+    corrected_obj = _store_result(data, corrected, inplace)
 
     # Update processing prov
-    processing_info = f'{__name__}.remove_peaks, '
-    processing_info += f'limits={limits}, '
-    processing_info += f'limit_units={limit_units}.'
+    processing_info = f'{__name__}.remove_peaks, limits={limits}, limit_units={limit_units}.'
 
     update_processing_prov(corrected_obj, 'Nuisance peak removal', processing_info)
 
@@ -420,7 +548,8 @@ def remove_peaks(data, limits, limit_units='ppm+shift', figure=False, report=Non
 
 
 def hlsvd_model_peaks(data, limits,
-                      limit_units='ppm+shift', components=5, figure=False, report=None, report_all=False):
+                      limit_units='ppm+shift', components=5, figure=False, report=None, report_all=False,
+                      inplace=False, n_jobs=1):
     '''Apply HLSVD to model spectum
     :param NIFTI_MRS data: Data to model
     :param limits: ppm limits between which spectrum will be modeled
@@ -429,45 +558,58 @@ def hlsvd_model_peaks(data, limits,
     :param figure: True to show figure.
     :param report: Provide output location as path to generate report
     :param report_all: True to output all indicies
+    :param inplace: True to write the result into data rather than a copy.
+    :param int n_jobs: Number of HLSVD processes, -1 for all cores. Default 1 (serial).
 
     :return: Corrected data in NIFTI_MRS format.
     '''
-    corrected_obj = data.copy()
-    for dd, idx in data.iterate_over_dims(iterate_over_space=True):
-
-        corrected_obj[idx] = preproc.model_fid_hlsvd(
-            dd,
-            data.dwelltime,
-            data.spectrometer_frequency[0],
-            limits,
-            limitUnits=limit_units,
-            numSingularValues=components)
-
-        if (figure or report) and (report_all or first_index(idx)):
-            from fsl_mrs.utils.preproc.remove import hlsvd_report
-            fig = hlsvd_report(dd,
-                               corrected_obj[idx],
-                               limits,
-                               data.bandwidth,
-                               data.spectrometer_frequency[0],
-                               nucleus=data.nucleus[0],
-                               limitUnits=limit_units,
-                               html=report)
-            if figure:
-                fig.show()
+    bw = data.bandwidth
+    sf = data.spectrometer_frequency[0]
+    nuc = data.nucleus[0]
+    dt = data.dwelltime
+
+    arr = data[:]
+    corrected = np.empty_like(arr)
+    fids, indices = zip(*_iterate_fids(arr))
+    hlsvd_func = partial(preproc.model_fid_hlsvd,
+                         dwelltime=dt,
+                         centralFrequency=sf,
+                         limits=limits,
+                         limitUnits=limit_units,
+                         numSingularValues=components)
+    results = _parallel_map(hlsvd_func, fids, n_jobs=n_jobs)
+
+    for idx, res in zip(indices, results):
+        corrected[idx] = res
+
+    if figure or report:
+        for dd, idx, res in zip(fids, indices, results):
+            if report_all or first_index(idx):
+                from fsl_mrs.utils.preproc.remove import hlsvd_report
+                fig = hlsvd_report(dd,
+                                   res,
+                                   limits,
+                                   bw,
+                                   sf,
+                                   nucleus=nuc,
+                                   limitUnits=limit_units,
+                                   html=report)
+                if figure:
+                    fig.show()
+
+    corrected_obj = _store_result(data, corrected, inplace)
 
     # Update processing prov
-    processing_info = f'{__name__}.hlsvd_model_peaks, '
-    processing_info += f'limits={limits}, '
-    processing_info += f'limit_units={limit_units}, '
-    processing_info += f'components={components}.'
+    processing_info = f'{__name__}.hlsvd_model_peaks, limits={limits}, '\
+                      f'limit_units={limit_units}, components={components}.'
 
     update_processing_prov(corrected_obj, 'HLSVD modeling', processing_info)
 
     return corrected_obj
 
 
-def tshift(data, tshiftStart=0.0, tshiftEnd=0.0, samples=None, figure=False, report=None, report_all=False):
+def tshift(data, tshiftStart=0.0, tshiftEnd=0.0, samples=None, figure=False, report=None, report_all=False,
+           inplace=False):
     '''Apply time shift or resampling to each FID
     :param NIFTI_MRS data: Data to shift
     :param float tshiftStart: Shift start time (s), negative padds with zeros
@@ -476,51 +618,56 @@ def tshift(data, tshiftStart=0.0, tshiftEnd=0.0, samples=None, figure=False, rep
     :param figure: True to show figure.
     :param report: Provide output location as path to generate report
     :param report_all: True to output all indicies
+    :param inplace: True to write the result into data rather than a copy.
+        Not possible if samples changes the number of points.
 
     :return: Shifted data in NIFTI_MRS format.
     '''
+    bw = data.bandwidth
+    sf = data.spectrometer_frequency[0]
+    nuc = data.nucleus[0]
+    dt = data.dwelltime
+
     if samples is None:
         samples = data.shape[3]
-        shifted_obj = data.copy()
-    else:
-        new_shape = list(data.shape)
-        new_shape[3] = samples
-        shifted_obj = NIFTI_MRS(
-            np.zeros(new_shape, dtype=data.dtype),
-            header=data.header)
+    elif inplace and samples != data.shape[3]:
+        raise ValueError('tshift cannot be applied in place when resampling to a new number of points.')
+
+    # timeshift fills every point (zero outside the original FID),
+    # so wrap its output directly rather than a zeroed copy.
+    shifted, newDT = _apply_vectorized(data,
+                                       preproc.timeshift,
+                                       dt,
+                                       tshiftStart,
+                                       tshiftEnd,
+                                       samples)
 
-    for dd, idx in data.iterate_over_dims(iterate_over_space=True):
-        shifted_obj[idx], newDT = preproc.timeshift(dd,
-                                                    data.dwelltime,
-                                                    tshiftStart,
-                                                    tshiftEnd,
-                                                    samples)
-
-        if (figure or report) and (report_all or first_index(idx)):
-            from fsl_mrs.utils.preproc.shifting import shift_report
-
-            original_hdr = {'bandwidth': data.bandwidth,
-                            'centralFrequency': data.spectrometer_frequency[0],
-                            'ResonantNucleus': data.nucleus[0]}
-            new_hdr = {'bandwidth': 1 / newDT,
-                       'centralFrequency': data.spectrometer_frequency[0],
-                       'ResonantNucleus': data.nucleus[0]}
-            fig = shift_report(dd,
-                               shifted_obj[idx],
-                               original_hdr,
-                               new_hdr,
-                               html=report,
-                               function='timeshift')
-            if figure:
-                fig.show()
+    if figure or report:
+        for dd, idx in data.iterate_over_dims(iterate_over_space=True):
+            if report_all or first_index(idx):
+                from fsl_mrs.utils.preproc.shifting import shift_report
+
+                original_hdr = {'bandwidth': bw,
+                                'centralFrequency': sf,
+                                'ResonantNucleus': nuc}
+                new_hdr = {'bandwidth': 1 / newDT,
+                           'centralFrequency': sf,
+                           'ResonantNucleus': nuc}
+                fig = shift_report(dd,
+                                   shifted[idx],
+                                   original_hdr,
+                                   new_hdr,
+                                   html=report,
+                                   function='timeshift')
+                if figure:
+                    fig.show()
 
+    shifted_obj = _store_result(data, shifted, inplace)
     shifted_obj.dwelltime = newDT
 
     # Update processing prov
-    processing_info = f'{__name__}.tshift, '
-    processing_info += f'tshiftStart={tshiftStart}, '
-    processing_info += f'tshiftEnd={tshiftEnd}, '
-    processing_info += f'samples={samples}.'
+    processing_info = f'{__name__}.tshift, tshiftStart={tshiftStart}, '\
+                      f'tshiftEnd={tshiftEnd}, samples={samples}.'
 
     update_processing_prov(shifted_obj, 'Temporal resample', processing_info)
 
@@ -540,52 +687,63 @@ def truncate_or_pad(data, npoints, position, figure=False, report=None, report_a
     :return: Padded or truncated data in NIFTI_MRS format.
     '''
 
+    if position not in ('first', 'last'):
+        raise ValueError("position must either be 'first' or 'last'")
+
+    # Output is only zero filled where padding is added,
+    # the rest is copied straight from the input.
+    orig_points = data.shape[3]
     new_shape = list(data.shape)
     new_shape[3] += npoints
-    trunc_obj = NIFTI_MRS(
-        np.zeros(new_shape, dtype=data.dtype),
-        header=data.header)
+    trunc = np.empty(new_shape, dtype=data.dtype)
+    arr = data[:]
 
-    for dd, idx in data.iterate_over_dims(iterate_over_space=True):
-        if npoints > 0:
-            trunc_obj[idx] = preproc.pad(dd,
-                                         np.abs(npoints),
-                                         position)
-            rep_func = 'pad'
-        elif npoints < 0:
-            trunc_obj[idx] = preproc.truncate(dd,
-                                              np.abs(npoints),
-                                              position)
-            rep_func = 'truncate'
+    if npoints > 0:
+        if position == 'first':
+            trunc[:, :, :, :npoints] = 0.0
+            trunc[:, :, :, npoints:] = arr
+        else:
+            trunc[:, :, :, :orig_points] = arr
+            trunc[:, :, :, orig_points:] = 0.0
+        rep_func = 'pad'
+    elif npoints < 0:
+        if position == 'first':
+            trunc[:] = arr[:, :, :, -npoints:]
         else:
-            rep_func = 'none'
-
-        if (figure or report) and (report_all or first_index(idx)):
-            from fsl_mrs.utils.preproc.shifting import shift_report
-            original_hdr = {'bandwidth': data.bandwidth,
-                            'centralFrequency': data.spectrometer_frequency[0],
-                            'ResonantNucleus': data.nucleus[0]}
-
-            fig = shift_report(dd,
-                               trunc_obj[idx],
-                               original_hdr,
-                               original_hdr,
-                               html=report,
-                               function=rep_func)
-            if figure:
-                fig.show()
+            trunc[:] = arr[:, :, :, :npoints]
+        rep_func = 'truncate'
+    else:
+        trunc[:] = arr
+        rep_func = 'none'
+
+    trunc_obj = NIFTI_MRS(trunc, header=data.header)
+
+    if figure or report:
+        for dd, idx in data.iterate_over_dims(iterate_over_space=True):
+            if report_all or first_index(idx):
+                from fsl_mrs.utils.preproc.shifting import shift_report
+                original_hdr = {'bandwidth': data.bandwidth,
+                                'centralFrequency': data.spectrometer_frequency[0],
+                                'ResonantNucleus': data.nucleus[0]}
+
+                fig = shift_report(dd,
+                                   trunc_obj[idx],
+                                   original_hdr,
+                                   original_hdr,
+                                   html=report,
+                                   function=rep_func)
+                if figure:
+                    fig.show()
 
     # Update processing prov
-    processing_info = f'{__name__}.truncate_or_pad, '
-    processing_info += f'npoints={npoints}, '
-    processing_info += f'position={position}.'
+    processing_info = f'{__name__}.truncate_or_pad, npoints={npoints}, position={position}.'
 
     update_processing_prov(trunc_obj, 'Zero-filling', processing_info)
 
     return trunc_obj
 
 
-def apodize(data, amount, filter='exp', figure=False, report=None, report_all=False):
+def apodize(data, amount, filter='exp', figure=False, report=None, report_all=False, inplace=False):
     '''Apodize FIDs using a exponential or Lorentzian to Gaussian filter.
     Lorentzian to Gaussian filter takes requires two window parameters (t_L and t_G)
 
@@ -595,38 +753,47 @@ def apodize(data, amount, filter='exp', figure=False, report=None, report_all=Fa
     :param figure: True to show figure.
     :param report: Provide output location as path to generate report
     :param report_all: True to output all indicies
+    :param inplace: True to write the result into data rather than a copy.
 
     :return: Filtered data in NIFTI_MRS format.
     '''
-    apod_obj = data.copy()
-    for dd, idx in data.iterate_over_dims(iterate_over_space=True):
-        apod_obj[idx] = preproc.apodize(dd,
-                                        data.dwelltime,
-                                        amount,
-                                        filter=filter)
-
-        if (figure or report) and (report_all or first_index(idx)):
-            from fsl_mrs.utils.preproc.filtering import apodize_report
-            fig = apodize_report(dd,
-                                 apod_obj[idx],
-                                 data.bandwidth,
-                                 data.spectrometer_frequency[0],
-                                 nucleus=data.nucleus[0],
-                                 html=report)
-            if figure:
-                fig.show()
+    bw = data.bandwidth
+    sf = data.spectrometer_frequency[0]
+    nuc = data.nucleus[0]
+    dt = data.dwelltime
+
+    # Window computed once and broadcast along the time (4th) dimension
+    arr = _working_precision(data[:])
+    window = apodization_window(data.shape[3], dt, amount, filter=filter)
+    window = np.reshape(np.asarray(window, dtype=np.result_type(arr.real.dtype, np.float32)),
+                        (-1,) + (1,) * (data.ndim - 4))
+
+    apodized = arr * window
+
+    if figure or report:
+        for dd, idx in data.iterate_over_dims(iterate_over_space=True):
+            if report_all or first_index(idx):
+                from fsl_mrs.utils.preproc.filtering import apodize_report
+                fig = apodize_report(dd,
+                                     apodized[idx],
+                                     bw,
+                                     sf,
+                                     nucleus=nuc,
+                                     html=report)
+                if figure:
+                    fig.show()
+
+    apod_obj = _store_result(data, apodized, inplace)
 
     # Update processing prov
-    processing_info = f'{__name__}.apodize, '
-    processing_info += f'amount={amount}, '
-    processing_info += f'filter={filter}.'
+    processing_info = f'{__name__}.apodize, amount={amount}, filter={filter}.'
 
     update_processing_prov(apod_obj, 'Apodization', processing_info)
 
     return apod_obj
 
 
-def fshift(data, amount, figure=False, report=None, report_all=False):
+def fshift(data, amount, figure=False, report=None, report_all=False, inplace=False):
     '''Apply frequency shift
 
     :param NIFTI_MRS data: Data to truncate or pad
@@ -634,40 +801,47 @@ def fshift(data, amount, figure=False, report=None, report_all=False):
     :param figure: True to show figure.
     :param report: Provide output location as path to generate report
     :param report_all: True to output all indicies
+    :param inplace: True to write the result into data rather than a copy.
 
     :return: Shifted data in NIFTI_MRS format.
     '''
+    bw = data.bandwidth
+    sf = data.spectrometer_frequency[0]
+    nuc = data.nucleus[0]
+    dt = data.dwelltime
+
+    shifted = _apply_vectorized(_working_precision(data[:]),
+                                preproc.freqshift,
+                                dt,
+                                amount)
 
-    shift_obj = data.copy()
-    for dd, idx in data.iterate_over_dims(iterate_over_space=True):
-        shift_obj[idx] = preproc.freqshift(dd,
-                                           data.dwelltime,
-                                           amount)
-
-        if (figure or report) and (report_all or first_index(idx)):
-            from fsl_mrs.utils.preproc.shifting import shift_report
-            original_hdr = {'bandwidth': data.bandwidth,
-                            'centralFrequency': data.spectrometer_frequency[0],
-                            'ResonantNucleus': data.nucleus[0]}
-            fig = shift_report(dd,
-                               shift_obj[idx],
-                               original_hdr,
-                               original_hdr,
-                               html=report,
-                               function='freqshift')
-            if figure:
-                fig.show()
+    if figure or report:
+        for dd, idx in data.iterate_over_dims(iterate_over_space=True):
+            if report_all or first_index(idx):
+                from fsl_mrs.utils.preproc.shifting import shift_report
+                original_hdr = {'bandwidth': bw,
+                                'centralFrequency': sf,
+                                'ResonantNucleus': nuc}
+                fig = shift_report(dd,
+                                   shifted[idx],
+                                   original_hdr,
+                                   original_hdr,
+                                   html=report,
+                                   function='freqshift')
+                if figure:
+                    fig.show()
+
+    shift_obj = _store_result(data, shifted, inplace)
 
     # Update processing prov
-    processing_info = f'{__name__}.fshift, '
-    processing_info += f'amount={amount}.'
+    processing_info = f'{__name__}.fshift, amount={amount}.'
 
     update_processing_prov(shift_obj, 'Frequency and phase correction', processing_info)
 
     return shift_obj
 
 
-def shift_to_reference(data, ppm_ref, peak_search, figure=False, report=None, report_all=False):
+def shift_to_reference(data, ppm_ref, peak_search, figure=False, report=None, report_all=False, inplace=False):
     '''Shift peak to known reference
 
     :param NIFTI_MRS data: Data to truncate or pad
@@ -675,37 +849,42 @@ def shift_to_reference(data, ppm_ref, peak_search, figure=False, report=None, re
     :param figure: True to show figure.
     :param report: Provide output location as path to generate report
     :param report_all: True to output all indicies
+    :param inplace: True to write the result into data rather than a copy.
 
     :return: Shifted data in NIFTI_MRS format.
     '''
+    bw = data.bandwidth
+    sf = data.spectrometer_frequency[0]
+    nuc = data.nucleus[0]
+
+    shifted, _ = _apply_vectorized(data,
+                                   preproc.shiftToRef,
+                                   ppm_ref,
+                                   bw,
+                                   sf,
+                                   nucleus=nuc,
+                                   ppmlim=peak_search)
 
-    shift_obj = data.copy()
-    for dd, idx in data.iterate_over_dims(iterate_over_space=True):
-        shift_obj[idx], _ = preproc.shiftToRef(dd,
-                                               ppm_ref,
-                                               data.bandwidth,
-                                               data.spectrometer_frequency[0],
-                                               nucleus=data.nucleus[0],
-                                               ppmlim=peak_search)
-
-        if (figure or report) and (report_all or first_index(idx)):
-            from fsl_mrs.utils.preproc.shifting import shift_report
-            original_hdr = {'bandwidth': data.bandwidth,
-                            'centralFrequency': data.spectrometer_frequency[0],
-                            'ResonantNucleus': data.nucleus[0]}
-            fig = shift_report(dd,
-                               shift_obj[idx],
-                               original_hdr,
-                               original_hdr,
-                               html=report,
-                               function='shiftToRef')
-            if figure:
-                fig.show()
+    if figure or report:
+        for dd, idx in data.iterate_over_dims(iterate_over_space=True):
+            if report_all or first_index(idx):
+                from fsl_mrs.utils.preproc.shifting import shift_report
+                original_hdr = {'bandwidth': bw,
+                                'centralFrequency': sf,
+                                'ResonantNucleus': nuc}
+                fig = shift_report(dd,
+                                   shifted[idx],
+                                   original_hdr,
+                                   original_hdr,
+                                   html=report,
+                                   function='shiftToRef')
+                if figure:
+                    fig.show()
+
+    shift_obj = _store_result(data, shifted, inplace)
 
     # Update processing prov
-    processing_info = f'{__name__}.shift_to_reference, '
-    processing_info += f'ppm_ref={ppm_ref}, '
-    processing_info += f'peak_search={peak_search}.'
+    processing_info = f'{__name__}.shift_to_reference, ppm_ref={ppm_ref}, peak_search={peak_search}.'
 
     update_processing_prov(shift_obj, 'Frequency and phase correction', processing_info)
 
@@ -730,8 +909,9 @@ def remove_unlike(data, ppmlim=None, sdlimit=1.96, niter=2, figure=False, report
     elif data.ndim < 5:
         raise ValueError('remove_unlike only makes sense for data with a dynamic dimension')
 
+    dyn_arr = data[:]
     goodFIDs, badFIDs, gIndicies, bIndicies, metric = \
-        preproc.identifyUnlikeFIDs(data[0, 0, 0, :, :].T,
+        preproc.identifyUnlikeFIDs(dyn_arr[0, 0, 0, :, :].T,
                                    data.bandwidth,
                                    data.spectrometer_frequency[0],
                                    nucleus=data.nucleus[0],
@@ -756,30 +936,20 @@ def remove_unlike(data, ppmlim=None, sdlimit=1.96, niter=2, figure=False, report
         if figure:
             fig.show()
 
-    goodFIDs = np.asarray(goodFIDs).T
-    goodFIDs = goodFIDs.reshape([1, 1, 1] + list(goodFIDs.shape))
-
+    # Select the dynamics directly into the output shape
     good_out = NIFTI_MRS(
-        goodFIDs,
+        dyn_arr[..., gIndicies],
         header=data.header)
 
     if len(badFIDs) > 0:
-        badFIDs = np.asarray(badFIDs).T
-        badFIDs = badFIDs.reshape([1, 1, 1] + list(badFIDs.shape))
         bad_out = NIFTI_MRS(
-            badFIDs,
+            dyn_arr[..., bIndicies],
             header=data.header)
     else:
         bad_out = None
 
     # Update processing prov
-    processing_info = f'{__name__}.remove_unlike, '
-    if ppmlim is None:
-        processing_info += 'ppmlim=None, '
-    else:
-        processing_info += f'ppmlim={ppmlim}, '
-    processing_info += f'sdlimit={sdlimit}, '
-    processing_info += f'niter={niter}.'
+    processing_info = f'{__name__}.remove_unlike, ppmlim={ppmlim}, sdlimit={sdlimit}, niter={niter}.'
 
     update_processing_prov(good_out, 'Outlier removal', processing_info)
 
@@ -799,33 +969,44 @@ def phase_correct(data, ppmlim, hlsvd=True, figure=False, report=None, report_al
     :return: Phased data in NIFTI_MRS format.
     '''
 
-    phs_obj = data.copy()
-    for dd, idx in data.iterate_over_dims(iterate_over_space=True):
-        phs_obj[idx], _, pos = preproc.phaseCorrect(
-            dd,
-            data.bandwidth,
-            data.spectrometer_frequency[0],
-            nucleus=data.nucleus[0],
-            ppmlim=ppmlim,
-            use_hlsvd=hlsvd)
-
-        if (figure or report) and (report_all or first_index(idx)):
-            from fsl_mrs.utils.preproc.phasing import phaseCorrect_report
-            fig = phaseCorrect_report(dd,
-                                      phs_obj[idx],
-                                      pos,
-                                      data.bandwidth,
-                                      data.spectrometer_frequency[0],
-                                      nucleus=data.nucleus[0],
-                                      ppmlim=ppmlim,
-                                      html=report)
-            if figure:
-                fig.show()
+    bw = data.bandwidth
+    sf = data.spectrometer_frequency[0]
+    nuc = data.nucleus[0]
+
+    # Phase all FIDs together, arranged with time last.
+    # HLSVD is sensitive to rounding of its input (and dominates the cost),
+    # so only the plain peak search can run in single precision.
+    arr = data[:]
+    if not hlsvd:
+        arr = _working_precision(arr)
+    phased, _, pos = preproc.phaseCorrect(
+        np.moveaxis(arr, 3, -1),
+        bw,
+        sf,
+        nucleus=nuc,
+        ppmlim=ppmlim,
+        use_hlsvd=hlsvd)
+    phased = np.moveaxis(phased, -1, 3)
+
+    if figure or report:
+        for dd, idx in _iterate_fids(arr):
+            if report_all or first_index(idx):
+                from fsl_mrs.utils.preproc.phasing import phaseCorrect_report
+                fig = phaseCorrect_report(dd,
+                                          phased[idx],
+                                          pos[idx[:3] + idx[4:]],
+                                          bw,
+                                          sf,
+                                          nucleus=nuc,
+                                          ppmlim=ppmlim,
+                                          html=report)
+                if figure:
+                    fig.show()
+
+    phs_obj = _store_result(data, phased, False)
 
     # Update processing prov
-    processing_info = f'{__name__}.phase_correct, '
-    processing_info += f'ppmlim={ppmlim}, '
-    processing_info += f'hlsvd={hlsvd}.'
+    processing_info = f'{__name__}.phase_correct, ppmlim={ppmlim}, hlsvd={hlsvd}.'
 
     update_processing_prov(phs_obj, 'Phasing', processing_info)
 
@@ -844,38 +1025,42 @@ def apply_fixed_phase(data, p0, p1=0.0, figure=False, report=None, report_all=Fa
 
     :return: Phased data in NIFTI_MRS format.
     '''
-    phs_obj = data.copy()
-    for dd, idx in data.iterate_over_dims(iterate_over_space=True):
-        phs_obj[idx] = preproc.applyPhase(dd,
-                                          p0 * (np.pi / 180.0))
-
-        if p1 != 0.0:
-            phs_obj[idx], _ = preproc.timeshift(
-                phs_obj[idx],
-                data.dwelltime,
-                p1,
-                p1,
-                samples=data.shape[3])
-
-        if (figure or report) and (report_all or first_index(idx)):
-            from fsl_mrs.utils.preproc.general import generic_report
-            original_hdr = {'bandwidth': data.bandwidth,
-                            'centralFrequency': data.spectrometer_frequency[0],
-                            'ResonantNucleus': data.nucleus[0]}
-            fig = generic_report(dd,
-                                 phs_obj[idx],
-                                 original_hdr,
-                                 original_hdr,
-                                 ppmlim=(0.2, 4.2),
-                                 html=report,
-                                 function='fixed phase')
-            if figure:
-                fig.show()
+    dt = data.dwelltime
+    npoints = data.shape[3]
+    original_hdr = {'bandwidth': data.bandwidth,
+                    'centralFrequency': data.spectrometer_frequency[0],
+                    'ResonantNucleus': data.nucleus[0]}
+
+    # Apply both orders to all FIDs together, arranged with time last.
+    arr = _working_precision(data[:])
+    phased = preproc.applyPhase(np.moveaxis(arr, 3, -1), p0 * (np.pi / 180.0))
+    if p1 != 0.0:
+        phased, _ = preproc.timeshift(
+            phased,
+            dt,
+            p1,
+            p1,
+            samples=npoints)
+    phased = np.moveaxis(phased, -1, 3)
+
+    if figure or report:
+        for dd, idx in _iterate_fids(arr):
+            if report_all or first_index(idx):
+                from fsl_mrs.utils.preproc.general import generic_report
+                fig = generic_report(dd,
+                                     phased[idx],
+                                     original_hdr,
+                                     original_hdr,
+                                     ppmlim=(0.2, 4.2),
+                                     html=report,
+                                     function='fixed phase')
+                if figure:
+                    fig.show()
+
+    phs_obj = _store_result(data, phased, False)
 
     # Update processing prov
-    processing_info = f'{__name__}.apply_fixed_phase, '
-    processing_info += f'p0={p0}, '
-    processing_info += f'p1={p1}.'
+    processing_info = f'{__name__}.apply_fixed_phase, p0={p0}, p1={p1}.'
 
     update_processing_prov(phs_obj, 'Phasing', processing_info)
 
@@ -902,44 +1087,46 @@ def subtract(data0, data1=None, dim=None, figure=False, report=None, report_all=
             raise DimensionsDoNotMatch('Subtraction dimension must be of length 2.'
                                        f' Currently {data0.shape[data0.dim_position(dim)]}')
 
-        sub_ob = data0.copy(remove_dim=dim)
-        for dd, idx in data0.iterate_over_dims(dim=dim,
-                                               iterate_over_space=True,
-                                               reduce_dim_index=True):
-            sub_ob[idx] = preproc.subtract(dd.T[0], dd.T[1])
-
-            if (figure or report) and (report_all or first_index(idx)):
-                from fsl_mrs.utils.preproc.general import add_subtract_report
-                fig = add_subtract_report(dd.T[0],
-                                          dd.T[1],
-                                          sub_ob[idx],
-                                          data0.bandwidth,
-                                          data0.spectrometer_frequency[0],
-                                          nucleus=data0.nucleus[0],
-                                          ppmlim=(0.2, 4.2),
-                                          html=report,
-                                          function='subtract')
-                if figure:
-                    fig.show()
+        sub_ob = data0.copy(remove_dim=dim, empty=True)
+        arr = _working_precision(data0[:])
+        axis = data0.dim_position(dim)
+        bw = data0.bandwidth
+        sf = data0.spectrometer_frequency[0]
+        nuc = data0.nucleus[0]
+        combined = preproc.subtract(np.take(arr, 0, axis=axis), np.take(arr, 1, axis=axis))
+
+        if figure or report:
+            for dd, idx in _iterate_fids(arr, dim=axis):
+                if report_all or first_index(idx):
+                    from fsl_mrs.utils.preproc.general import add_subtract_report
+                    fig = add_subtract_report(dd.T[0],
+                                              dd.T[1],
+                                              combined[idx],
+                                              bw,
+                                              sf,
+                                              nucleus=nuc,
+                                              ppmlim=(0.2, 4.2),
+                                              html=report,
+                                              function='subtract')
+                    if figure:
+                        fig.show()
+
+        sub_ob[:] = combined
 
     elif data1 is not None:
 
-        sub_ob = data0.copy()
-        sub_ob[:] = (data0[:] - data1[:]) / 2
+        # data0[:] is a new array, so combine into it without temporaries
+        combined = _working_precision(data0[:])
+        np.subtract(combined, _working_precision(data1[:]), out=combined)
+        combined *= 0.5
+        sub_ob = _store_result(data0, combined, False)
 
     else:
         raise ValueError('One of data1 or dim arguments must not be None.')
 
     # Update processing prov
-    processing_info = f'{__name__}.subtract, '
-    if data1 is None:
-        processing_info += 'data1=None, '
-    else:
-        processing_info += f'data1={data1.filename}, '
-    if dim is None:
-        processing_info += 'dim=None.'
-    else:
-        processing_info += f'dim={dim}.'
+    data1_name = None if data1 is None else data1.filename
+    processing_info = f'{__name__}.subtract, data1={data1_name}, dim={dim}.'
 
     update_processing_prov(sub_ob, 'Subtraction of sub-spectra', processing_info)
 
@@ -966,73 +1153,77 @@ def add(data0, data1=None, dim=None, figure=False, report=None, report_all=False
             raise DimensionsDoNotMatch('Addition dimension must be of length 2.'
                                        f' Currently {data0.shape[data0.dim_position(dim)]}')
 
-        add_ob = data0.copy(remove_dim=dim)
-        for dd, idx in data0.iterate_over_dims(dim=dim,
-                                               iterate_over_space=True,
-                                               reduce_dim_index=True):
-            add_ob[idx] = preproc.add(dd.T[0], dd.T[1])
-
-            if (figure or report) and (report_all or first_index(idx)):
-                from fsl_mrs.utils.preproc.general import add_subtract_report
-                fig = add_subtract_report(dd.T[0],
-                                          dd.T[1],
-                                          add_ob[idx],
-                                          data0.bandwidth,
-                                          data0.spectrometer_frequency[0],
-                                          nucleus=data0.nucleus[0],
-                                          ppmlim=(0.2, 4.2),
-                                          html=report,
-                                          function='add')
-                if figure:
-                    fig.show()
+        add_ob = data0.copy(remove_dim=dim, empty=True)
+        arr = _working_precision(data0[:])
+        axis = data0.dim_position(dim)
+        bw = data0.bandwidth
+        sf = data0.spectrometer_frequency[0]
+        nuc = data0.nucleus[0]
+        combined = preproc.add(np.take(arr, 0, axis=axis), np.take(arr, 1, axis=axis))
+
+        if figure or report:
+            for dd, idx in _iterate_fids(arr, dim=axis):
+                if report_all or first_index(idx):
+                    from fsl_mrs.utils.preproc.general import add_subtract_report
+                    fig = add_subtract_report(dd.T[0],
+                                              dd.T[1],
+                                              combined[idx],
+                                              bw,
+                                              sf,
+                                              nucleus=nuc,
+                                              ppmlim=(0.2, 4.2),
+                                              html=report,
+                                              function='add')
+                    if figure:
+                        fig.show()
+
+        add_ob[:] = combined
 
     elif data1 is not None:
 
-        add_ob = data0.copy()
-        add_ob[:] = (data0[:] + data1[:]) / 2
+        # data0[:] is a new array, so combine into it without temporaries
+        combined = _working_precision(data0[:])
+        np.add(combined, _working_precision(data1[:]), out=combined)
+        combined *= 0.5
+        add_ob = _store_result(data0, combined, False)
 
     else:
         raise ValueError('One of data1 or dim arguments must not be None.')
 
     # Update processing prov
-    processing_info = f'{__name__}.add, '
-    if data1 is None:
-        processing_info += 'data1=None, '
-    else:
-        processing_info += f'data1={data1.filename}, '
-    if dim is None:
-        processing_info += 'dim=None.'
-    else:
-        processing_info += f'dim={dim}.'
+    data1_name = None if data1 is None else data1.filename
+    processing_info = f'{__name__}.add, data1={data1_name}, dim={dim}.'
 
     update_processing_prov(add_ob, 'Addition of sub-spectra', processing_info)
 
     return add_ob
 
 
-def conjugate(data, figure=False, report=None, report_all=False):
+def conjugate(data, figure=False, report=None, report_all=False, inplace=False):
     '''Conjugate the data
 
     :param NIFTI_MRS data: Data to truncate or pad
     :param figure: True to show figure.
     :param report: Provide output location as path to generate report
     :param report_all: True to output all indicies
+    :param inplace: True to write the result into data rather than a copy.
 
     :return: Conjugated data in NIFTI_MRS format.
     '''
 
-    conj_data = data.copy()
-    conj_data[:] = conj_data[:].conj()
+    original_hdr = {'bandwidth': data.bandwidth,
+                    'centralFrequency': data.spectrometer_frequency[0],
+                    'ResonantNucleus': data.nucleus[0]}
+
+    conj_arr = data[:]
+    np.conjugate(conj_arr, out=conj_arr)
 
     if report:
         for dd, idx in data.iterate_over_dims(iterate_over_space=True):
             if report_all or first_index(idx):
                 from fsl_mrs.utils.preproc.general import generic_report
-                original_hdr = {'bandwidth': data.bandwidth,
-                                'centralFrequency': data.spectrometer_frequency[0],
-                                'ResonantNucleus': data.nucleus[0]}
                 fig = generic_report(dd,
-                                     conj_data[idx],
+                                     conj_arr[idx],
                                      original_hdr,
                                      original_hdr,
                                      ppmlim=(0.2, 4.2),
@@ -1041,6 +1232,8 @@ def conjugate(data, figure=False, report=None, report_all=False):
                 if figure:
                     fig.show()
 
+    conj_data = _store_result(data, conj_arr, inplace)
+
     # Update processing prov
     processing_info = f'{__name__}.conjugate.'
     update_processing_prov(conj_data, 'Conjugation', processing_info)
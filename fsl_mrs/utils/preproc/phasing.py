@@ -8,65 +8,201 @@
 # Copyright (C) 2019 University of Oxford
 # SHBASECOPYRIGHT
 
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
 import numpy as np
-from fsl_mrs.core import MRS
-from fsl_mrs.utils.misc import extract_spectrum, checkCFUnits
-from fsl_mrs.utils.preproc.shifting import pad
+import scipy.fft as sfft
+from fsl_mrs.utils.constants import PPM_SHIFT
+from fsl_mrs.utils.misc import checkCFUnits, calculateAxes, limit_to_range
 from fsl_mrs.utils.preproc.remove import hlsvd
 
+# Zero-fill factor of the spectrum searched for the maximum by phaseCorrect.
+_ZERO_FILL = 4
+
+# Size of the zero-filled spectra transformed at once by _phase_correct_fast,
+# small enough for the block to stay in cache.
+_FFT_BLOCK_BYTES = 2 ** 23
+
+# Per-thread zero-filled FFT buffer reused by _phase_correct_fast.
+_scratch = threading.local()
+
 
 def applyPhase(FID, phaseAngle):
     """
     Multiply FID by constant phase
     """
-    return FID * np.exp(1j * phaseAngle)
+    return FID * np.exp(1j * phaseAngle).astype(np.result_type(FID.dtype, np.complex64))
 
 
-def phaseCorrect(FID, bw, cf, nucleus='1H', ppmlim=(2.8, 3.2), shift=True, use_hlsvd=False):
+def phaseCorrect(FID, bw, cf, nucleus='1H', ppmlim=(2.8, 3.2), shift=True, use_hlsvd=False,
+                 hlsvd_skip_ratio=5.0):
     """ Phase correction based on the phase of a maximum point.
 
     HLSVD is used to remove peaks outside the limits to flatten baseline first.
+    This is skipped for FIDs whose maximum within the limits is already more than
+    hlsvd_skip_ratio times the maximum in the regions HLSVD would remove.
 
     Args:
-        FID (ndarray): Time domain data
+        FID (ndarray): Time domain data, or stack of FIDs with time on the last axis
         bw (float): bandwidth
         cf (float): central frequency in Hz
         ppmlim (tuple,optional)  : Limit to this ppm range
         shift (bool,optional)    : Apply H20 shft
         use_hlsvd (bool,optional)    : Enable hlsvd step
+        hlsvd_skip_ratio (float,optional) : Peak ratio above which hlsvd is skipped, None to always run
 
     Returns:
         FID (ndarray): Phase corrected FID
-        phaseAngle (double): shift in radians
-        index (int): Index of phased point
+        phaseAngle (double): shift in radians (array for a stack of FIDs)
+        index (int): Index of phased point (array for a stack of FIDs)
     """
 
     cf = checkCFUnits(cf, units='Hz')
 
     if use_hlsvd:
-        # Run HLSVD to remove peaks outside limits
-        try:
-            fid_hlsvd = hlsvd(FID, 1 / bw, cf, (ppmlim[1] + 0.5, ppmlim[1] + 3.0), limitUnits='ppm+shift')
-            fid_hlsvd = hlsvd(fid_hlsvd, 1 / bw, cf, (ppmlim[0] - 3.0, ppmlim[0] - 0.5), limitUnits='ppm+shift')
-        except Exception:
-            fid_hlsvd = FID
-            print('HLSVD in phaseCorrect failed, proceeding to phasing.')
+        # Run HLSVD to remove peaks outside limits, one FID at a time,
+        # unless the peak within the limits already dominates.
+        if hlsvd_skip_ratio is None:
+            run_hlsvd = np.ones(FID.shape[:-1], dtype=bool)
+        else:
+            run_hlsvd = _peak_ratio(FID, bw, cf, nucleus, ppmlim, shift) <= hlsvd_skip_ratio
+        fid_hlsvd = FID.copy()
+        to_run = [idx for idx in np.ndindex(run_hlsvd.shape) if run_hlsvd[idx]]
+        for idx, fid in zip(to_run, _thread_map(lambda idx: _hlsvd_outside_limits(FID[idx], bw, cf, ppmlim),
+                                                to_run)):
+            fid_hlsvd[idx] = fid
     else:
         fid_hlsvd = FID
 
-    # Find maximum of absolute spectrum in ppm limit
-    padFID = pad(fid_hlsvd, FID.size * 3)
-    MRSargs = {'FID': padFID,
-               'bw': bw,
-               'cf': cf,
-               'nucleus': nucleus}
-    mrs = MRS(**MRSargs)
-    spec = extract_spectrum(mrs, padFID, ppmlim=ppmlim, shift=shift)
+    # Find maximum of absolute spectrum (zero-filled to 4x length) in ppm limit
+    npoints = _ZERO_FILL * FID.shape[-1]
+    window = _search_window(npoints, bw, cf, nucleus, tuple(ppmlim), shift)
+    phased, phaseAngle, maxIndex = _phase_correct_fast(fid_hlsvd, npoints, window, apply_to=FID)
+    index = np.round(maxIndex / _ZERO_FILL).astype(int)
+
+    if FID.ndim == 1:
+        return phased, phaseAngle[()], int(index)
+    return phased, phaseAngle, index
+
+
+@lru_cache(maxsize=32)
+def _search_window(npoints, bw, cf, nucleus, ppmlim, shift):
+    """Indices of the unshifted FFT of npoints points covering ppmlim."""
+    axes = calculateAxes(bw, cf, npoints, PPM_SHIFT[nucleus])
+    first, last = limit_to_range(axes['ppmshift'] if shift else axes['ppm'], ppmlim)
+    window = (np.arange(first, last) - npoints // 2) % npoints
+    window.flags.writeable = False
+    return window
 
-    maxIndex = np.argmax(np.abs(spec))
-    phaseAngle = -np.angle(spec[maxIndex])
 
-    return applyPhase(FID, phaseAngle), phaseAngle, int(np.round(maxIndex / 4))
+def _phase_correct_fast(FID, npoints, window, apply_to=None):
+    """Zero-order phase FIDs (time on the last axis) on the maximum of
+    their absolute spectra, zero-filled to npoints, within window.
+
+    The phase is applied to apply_to if given (e.g. the FIDs before
+    HLSVD), otherwise to FID.
+
+    Returns the phased FIDs, the phase angles and the index of each
+    maximum within the window.
+    """
+    # As FIDToSpec, but the FFT zero fills, only the search window is taken
+    # and the halved first point is applied as a constant offset.
+    # FIDs are transformed in blocks so the zero-filled spectra are never
+    # held for the whole batch. Each block is zero-filled and transformed
+    # in place in a buffer reused between blocks and calls.
+    flatFID = FID.reshape(-1, FID.shape[-1])
+    npts = flatFID.shape[-1]
+    spec = np.empty((flatFID.shape[0], len(window)), dtype=np.result_type(FID.dtype, np.complex64))
+    block = min(flatFID.shape[0], max(1, _FFT_BLOCK_BYTES // (npoints * spec.itemsize)))
+    buffer = _padded_buffer(block, npoints, spec.dtype)
+    for start in range(0, flatFID.shape[0], block):
+        fids = flatFID[start:start + block]
+        padded = buffer[:fids.shape[0]]
+        padded[:, :npts] = fids
+        padded[:, npts:] = 0.0
+        spec[start:start + block] = _fft_module().fft(padded, axis=-1, overwrite_x=True, workers=-1)[:, window]
+    spec -= 0.5 * flatFID[:, :1]
+    spec /= np.sqrt(npoints)
+    spec = spec.reshape(FID.shape[:-1] + (len(window),))
+
+    absSpec = np.abs(spec)
+    maxIndex = np.argmax(absSpec, axis=-1)
+
+    # Rotate by conj(peak)/|peak|, i.e. exp(-1j * angle(peak)), without the transcendentals.
+    peak = np.take_along_axis(spec, maxIndex[..., None], axis=-1)
+    peakAbs = np.take_along_axis(absSpec, maxIndex[..., None], axis=-1)
+    rot = np.divide(peak.conj(), peakAbs, out=np.ones_like(peak), where=peakAbs > 0)
+
+    if apply_to is None:
+        apply_to = FID
+    return apply_to * rot, np.angle(rot[..., 0]), maxIndex
+
+
+def _padded_buffer(rows, npoints, dtype):
+    """(rows x npoints) buffer of dtype for the calling thread, reused between calls."""
+    buffer = getattr(_scratch, 'buffer', None)
+    if buffer is None or buffer.shape[0] < rows or buffer.shape[1] != npoints or buffer.dtype != dtype:
+        buffer = np.empty((rows, npoints), dtype=dtype)
+        _scratch.buffer = buffer
+    return buffer[:rows]
+
+
+@lru_cache(maxsize=None)
+def _fft_module():
+    """pyFFTW's scipy.fft interface, with its plan cache enabled, if installed, otherwise scipy.fft."""
+    try:
+        import pyfftw
+        import pyfftw.interfaces.scipy_fft as fft_module
+    except ImportError:
+        return sfft
+    pyfftw.interfaces.cache.enable()
+    return fft_module
+
+
+def _fft(FID, n):
+    """FFT of length n along the last axis, using all cores."""
+    return _fft_module().fft(FID, n=n, axis=-1, workers=-1)
+
+
+def _peak_ratio(FID, bw, cf, nucleus, ppmlim, shift):
+    """Ratio of the maximum of the absolute spectrum within ppmlim to the
+    maximum in the regions removed by _hlsvd_outside_limits."""
+    npoints = FID.shape[-1]
+    absSpec = np.abs(_fft(FID, npoints))
+
+    def region_max(limits, shift):
+        return absSpec[..., _search_window(npoints, bw, cf, nucleus, limits, shift)].max(axis=-1, initial=0.0)
+
+    inside = region_max(tuple(ppmlim), shift)
+    outside = np.maximum(region_max((ppmlim[1] + 0.5, ppmlim[1] + 3.0), True),
+                         region_max((ppmlim[0] - 3.0, ppmlim[0] - 0.5), True))
+    return np.divide(inside, outside, out=np.full_like(inside, np.inf), where=outside > 0)
+
+
+def _thread_map(func, args):
+    """List of func(arg) for each arg, run on a thread pool if more than one.
+
+    Used for the independent per-FID HLSVD calls, which spend most of
+    their time in LAPACK with the GIL released.
+    """
+    workers = min(os.cpu_count() or 1, len(args))
+    if workers < 2:
+        return [func(arg) for arg in args]
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(func, args))
+
+
+def _hlsvd_outside_limits(FID, bw, cf, ppmlim):
+    """Remove peaks either side of ppmlim with HLSVD, returning FID if this fails."""
+    try:
+        fid_hlsvd = hlsvd(FID, 1 / bw, cf, (ppmlim[1] + 0.5, ppmlim[1] + 3.0), limitUnits='ppm+shift')
+        return hlsvd(fid_hlsvd, 1 / bw, cf, (ppmlim[0] - 3.0, ppmlim[0] - 0.5), limitUnits='ppm+shift')
+    except Exception:
+        print('HLSVD in phaseCorrect failed, proceeding to phasing.')
+        return FID
 
 
 def phaseCorrect_report(inFID,
@@ -100,35 +236,42 @@ def phaseCorrect_report(inFID,
     # Make a new figure
     fig = go.Figure()
 
+    # Axes and spectra, each computed once (input and output share axes)
+    axes_wide = plotIn.getAxes(ppmlim=widelimit)
+    spec_in_wide = np.real(plotIn.get_spec(ppmlim=widelimit))
+    spec_out_wide = np.real(plotOut.get_spec(ppmlim=widelimit))
+    axes_in_lim = plotIn.getAxes(ppmlim=ppmlim)
+    spec_in_lim = plotIn.get_spec(ppmlim=ppmlim)
+
     # Add lines to figure
-    def addline(fig, mrs, lim, name, linestyle):
-        trace = go.Scatter(x=mrs.getAxes(ppmlim=lim),
-                           y=np.real(mrs.get_spec(ppmlim=lim)),
+    def addline(fig, x, y, name, linestyle):
+        trace = go.Scatter(x=x,
+                           y=y,
                            mode='lines',
                            name=name,
                            line=linestyle)
         return fig.add_trace(trace)
 
-    fig = addline(fig, plotIn, widelimit, 'Unphased', lines['in'])
-    fig = addline(fig, plotIn, ppmlim, 'Search region', lines['emph'])
+    fig = addline(fig, axes_wide, spec_in_wide, 'Unphased', lines['in'])
+    fig = addline(fig, axes_in_lim, np.real(spec_in_lim), 'Search region', lines['emph'])
 
     if position is None:
         # re-estimate here.
-        position = np.argmax(np.abs(plotIn.get_spec(ppmlim=ppmlim)))
+        position = np.argmax(np.abs(spec_in_lim))
 
     # Deal with rounding errors
-    if position >= len(plotIn.getAxes(ppmlim=ppmlim)):
-        position = len(plotIn.getAxes(ppmlim=ppmlim)) - 1
+    if position >= len(axes_in_lim):
+        position = len(axes_in_lim) - 1
 
-    axis    = [plotIn.getAxes(ppmlim=ppmlim)[position]]
-    y_data  = [np.real(plotIn.get_spec(ppmlim=ppmlim))[position]]
+    axis    = [axes_in_lim[position]]
+    y_data  = [np.real(spec_in_lim[position])]
     trace = go.Scatter(x=axis, y=y_data,
                        mode='markers',
                        name='max point',
                        marker=dict(color=colors['emph'], symbol='x', size=8))
     fig.add_trace(trace)
 
-    fig = addline(fig, plotOut, widelimit, 'Phased', lines['out'])
+    fig = addline(fig, axes_wide, spec_out_wide, 'Phased', lines['out'])
 
     # Axes layout
     plotAxesStyle(fig, widelimit, title='Phase correction summary')
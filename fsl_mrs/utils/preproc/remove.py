@@ -117,18 +117,18 @@ def _hlsvd(FID, dwelltime, centralFrequency, limits,
     limitIndicies = (frequencies > frequencylimit[0]) & \
                     (frequencies < frequencylimit[1])
 
-    sumFID = np.zeros(FID.shape, dtype=np.complex128)
-    timeAxis = np.linspace(0, dwelltime * (FID.size - 1), FID.size)
-
-    for use, f, d, a, p in zip(limitIndicies,
-                               frequencies,
-                               damping_factors,
-                               amplitudes,
-                               phases):
-        if use:
-            sumFID += a * np.exp((timeAxis / d)
-                                 + 1j * 2 * np.pi
-                                 * (f * timeAxis + p / 360.0))
+    # Sum the selected lorentzian components, evaluated together as
+    # a (time x component) array
+    timeAxis = np.linspace(0, dwelltime * (FID.size - 1), FID.size)[:, None]
+    a = amplitudes[limitIndicies]
+    d = damping_factors[limitIndicies]
+    f = frequencies[limitIndicies]
+    p = phases[limitIndicies]
+    sumFID = np.sum(a * np.exp((timeAxis / d)
+                               + 1j * 2 * np.pi
+                               * (f * timeAxis + p / 360.0)),
+                    axis=1,
+                    dtype=np.complex128)
     return sumFID
 
 
@@ -7,15 +7,15 @@
 # SHBASECOPYRIGHT
 
 import numpy as np
+import scipy.fft as sfft
 from fsl_mrs.core import MRS
-from fsl_mrs.utils.misc import extract_spectrum
 
 
 def timeshift(FID, dwelltime, shiftstart, shiftend, samples=None):
     """ Shift data on time axis
 
     Args:
-        FID (ndarray): Time domain data
+        FID (ndarray): Time domain data, time on the last axis
         dwelltime (float): dwell time in seconds
         shiftstart (float): Shift start point in seconds
         shiftend (float): Shift end point in seconds
@@ -24,15 +24,27 @@ def timeshift(FID, dwelltime, shiftstart, shiftend, samples=None):
     Returns:
         FID (ndarray): Shifted FID
     """
-    originalAcqTime = dwelltime * (FID.size - 1)
-    originalTAxis = np.linspace(0, originalAcqTime, FID.size)
+    npoints = FID.shape[-1]
+    originalAcqTime = dwelltime * (npoints - 1)
+    originalTAxis = np.linspace(0, originalAcqTime, npoints)
     if samples is None:
         newDT = dwelltime
     else:
         totalacqTime = originalAcqTime - shiftstart + shiftend
         newDT = totalacqTime / samples
     newTAxis = np.arange(originalTAxis[0] + shiftstart, originalTAxis[-1] + shiftend, newDT)
-    FID = np.interp(newTAxis, originalTAxis, FID, left=0.0 + 1j * 0.0, right=0.0 + 1j * 0.0)
+
+    # Linear interpolation (as np.interp) along the last axis,
+    # zero outside the original time axis.
+    # Indices and weights are shared by all FIDs.
+    inside = (newTAxis >= originalTAxis[0]) & (newTAxis <= originalTAxis[-1])
+    lower = np.clip(np.searchsorted(originalTAxis, newTAxis, side='right') - 1, 0, max(npoints - 2, 0))
+    upper = np.minimum(lower + 1, npoints - 1)
+    step = originalTAxis[upper] - originalTAxis[lower]
+    weight = np.divide(newTAxis - originalTAxis[lower], step, out=np.zeros_like(step), where=step > 0)
+    weight = weight.astype(np.result_type(FID.real.dtype, np.float32))
+    FID = FID[..., lower] + (FID[..., upper] - FID[..., lower]) * weight
+    FID[..., ~inside] = 0.0
 
     return FID, newDT
 
@@ -41,23 +53,38 @@ def freqshift(FID, dwelltime, shift):
     """ Shift data on frequency axis
 
     Args:
-        FID (ndarray): Time domain data
+        FID (ndarray): Time domain data, time on the last axis
         dwelltime (float): dwelltime in seconds
-        shift (float): shift in Hz
+        shift (float): shift in Hz, or array broadcastable against FID
 
     Returns:
-        FID (ndarray): Shifted FID
+        FID (ndarray): Shifted FID, complex64 input stays complex64
+    """
+    npoints = FID.shape[-1]
+    # Time axis spacing as np.linspace(0, dwelltime * npoints, npoints)
+    tStep = dwelltime * npoints / max(npoints - 1, 1)
+    phasor = _phase_ramp(npoints, 2 * np.pi * tStep * np.asarray(shift))
+    return FID * phasor.astype(np.result_type(FID.dtype, np.complex64), copy=False)
+
+
+def _phase_ramp(npoints, omega):
+    """exp(1j * omega * k) for k in 0 to npoints - 1, along the last axis.
+
+    omega is a scalar or an array with a last axis of length one. Rather
+    than a complex exponential per point, the ramp is built from two short
+    ramps as exp(1j * omega * (a * block + b)) = outer[a] * inner[b].
     """
-    tAxis = np.linspace(0, dwelltime * FID.size, FID.size)
-    phaseRamp = 2 * np.pi * tAxis * shift
-    FID = FID * np.exp(1j * phaseRamp)
-    return FID
+    block = max(int(np.ceil(np.sqrt(npoints))), 1)
+    inner = np.exp(1j * omega * np.arange(block))
+    outer = np.exp(1j * omega * block * np.arange(-(-npoints // block)))
+    ramp = outer[..., :, np.newaxis] * inner[..., np.newaxis, :]
+    return ramp.reshape(ramp.shape[:-2] + (-1,))[..., :npoints]
 
 
 def shiftToRef(FID, target, bw, cf, nucleus='1H', ppmlim=(2.8, 3.2), shift=True):
     '''Find a maximum and shift that maximum to a reference position.
 
-    :param FID: FID
+    :param FID: FID, or stack of FIDs with time on the last axis
     :param float target: reference position in ppm
     :param float bw: Bandwidth or spectral width in Hz.
     :param float cf: Central or spectrometer frequency (MHz)
@@ -66,27 +93,35 @@ def shiftToRef(FID, target, bw, cf, nucleus='1H', ppmlim=(2.8, 3.2), shift=True)
     :param bool shift: If True (default) ppm values include shift
 
     :return: Shifted FID
-    :return: Shifted amount in ppm
+    :return: Shifted amount in ppm (one per FID)
     '''
 
-    # Find maximum of absolute spectrum in ppm limit
-    padFID = pad(FID, FID.size * 3)
-    MRSargs = {'FID': padFID,
+    # Find maximum of absolute spectrum (zero-filled to 4x length) in ppm limit
+    # All FIDs are transformed together, the MRS object only provides the axes.
+    npoints = FID.shape[-1] * 4
+    MRSargs = {'FID': np.zeros(npoints, dtype=complex),
                'bw': bw,
                'cf': cf,
                'nucleus': nucleus}
     mrs = MRS(**MRSargs)
-    spec = extract_spectrum(mrs, padFID, ppmlim=ppmlim, shift=shift)
+    first, last = mrs.ppmlim_to_range(ppmlim=ppmlim, shift=shift)
+
+    # As FIDToSpec, but the FFT zero fills, only the search window is taken
+    # from the unshifted spectrum and the halved first point is applied as
+    # a constant offset.
+    window = (np.arange(first, last) - npoints // 2) % npoints
+    spec = sfft.fft(FID, n=npoints, axis=-1, norm='ortho', workers=-1)[..., window]
+    spec -= 0.5 * FID[..., :1] / np.sqrt(npoints)
     if shift:
         extractedAxis = mrs.getAxes(ppmlim=ppmlim)
     else:
         extractedAxis = mrs.getAxes(ppmlim=ppmlim, axis='ppm')
 
-    maxIndex = np.argmax(np.abs(spec))
+    maxIndex = np.argmax(np.abs(spec), axis=-1)
     shiftAmount = extractedAxis[maxIndex] - target
     shiftAmountHz = shiftAmount * mrs.centralFrequency / 1E6
 
-    return freqshift(FID, 1 / bw, -shiftAmountHz), shiftAmount
+    return freqshift(FID, 1 / bw, -np.expand_dims(shiftAmountHz, -1)), shiftAmount
 
 
 def truncate(FID, k, first_or_last='last'):
@@ -95,7 +130,7 @@ def truncate(FID, k, first_or_last='last'):
 
     Parameters:
     -----------
-    FID           : array-like
+    FID           : array-like (time on the last axis)
     k             : int (number of timepoints to remove)
     first_or_last : either 'first' or 'last' (which bit to truncate)
 
@@ -106,9 +141,9 @@ def truncate(FID, k, first_or_last='last'):
     FID_trunc = FID.copy()
 
     if first_or_last == 'first':
-        return FID_trunc[k:]
+        return FID_trunc[..., k:]
     elif first_or_last == 'last':
-        return FID_trunc[:-k]
+        return FID_trunc[..., :-k]
     else:
         raise(Exception("Last parameter must either be 'first' or 'last'"))
 
@@ -119,7 +154,7 @@ def pad(FID, k, first_or_last='last'):
 
     Parameters:
     -----------
-    FID           : array-like
+    FID           : array-like (time on the last axis)
     k             : int (number of timepoints to add)
     first_or_last : either 'first' or 'last' (which bit to pad)
 
@@ -128,11 +163,12 @@ def pad(FID, k, first_or_last='last'):
     array-like
     """
     FID_pad = FID.copy()
+    no_pad = [(0, 0)] * (FID_pad.ndim - 1)
 
     if first_or_last == 'first':
-        return np.pad(FID_pad, (k, 0))
+        return np.pad(FID_pad, no_pad + [(k, 0)])
     elif first_or_last == 'last':
-        return np.pad(FID_pad, (0, k))
+        return np.pad(FID_pad, no_pad + [(0, k)])
     else:
         raise(Exception("Last parameter must either be 'first' or 'last'"))
 